@@ -1,19 +1,63 @@
 import argparse
-import re
-import requests
+import asyncio
+import hashlib
+import httpx
 from bs4 import BeautifulSoup, Tag
 import time
-import json
 import os
-from collections import deque
+import pickle
+import shelve
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urljoin, urlparse, parse_qs
+from urllib.robotparser import RobotFileParser
+
+from jsonl_to_json import compact, dumps_line
+from wiki_text import finalize_text, rows_to_markdown
+
+# lxml(C 파서)이 있으면 사용, 없으면 내장 html.parser로 폴백
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# selectolax(Lexbor)가 있으면 기본 백엔드로 사용, 없으면 BeautifulSoup 경로로 폴백
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    _HAS_SELECTOLAX = True
+except ImportError:
+    _HAS_SELECTOLAX = False
+
+# pybloom_live가 있으면 방문 URL을 Bloom 필터로 관리 (없으면 일반 set)
+try:
+    from pybloom_live import ScalableBloomFilter
+    _HAS_PYBLOOM = True
+except ImportError:
+    _HAS_PYBLOOM = False
+
+# datasketch가 있으면 MinHash-LSH로 near-duplicate 페이지를 걸러낸다
+try:
+    from datasketch import MinHash, MinHashLSH
+    _HAS_DATASKETCH = True
+except ImportError:
+    _HAS_DATASKETCH = False
 
 # --- 설정 ---
 BASE_URL = "https://wiki.gearcity.info/doku.php?id=start"
 DOMAIN = "wiki.gearcity.info"
-DELAY = float(os.getenv("WIKI_CRAWL_DELAY", "5.0"))  # 매너 딜레이 (초)
+DELAY = float(os.getenv("WIKI_CRAWL_DELAY", "5.0"))  # 매너 딜레이 (초, robots.txt Crawl-delay가 더 길면 그쪽을 따름)
+CRAWL_BURST = int(os.getenv("WIKI_CRAWL_BURST", "1"))  # 쉬고 난 뒤 연달아 보낼 수 있는 요청 수
 REQUEST_TIMEOUT = 15  # 요청 타임아웃 (초)
+PARSE_WORKERS = int(os.getenv("WIKI_PARSE_WORKERS", "2"))  # 파싱 프로세스 수 (요청이 DELAY 간격으로 순차라 대기 페이지는 많아야 1개 — 2개면 충분)
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
 OUTPUT_FILE = "data/wiki/gearcity_wiki_data.json"
+# near-duplicate 감지 (MinHash-LSH): Jaccard 유사도 임계값 / 순열 수 / 문자 shingle 길이
+DEDUP_THRESHOLD = 0.9
+DEDUP_NUM_PERM = 128
+DEDUP_SHINGLE_SIZE = 5
+# HTML 파싱 백엔드: "selectolax" (Lexbor, 기본) | "bs4" (BeautifulSoup 폴백)
+HTML_BACKEND = os.getenv("WIKI_HTML_BACKEND", "selectolax" if _HAS_SELECTOLAX else "bs4")
 
 # --- 페이지 필터링 ---
 # 전체 섹션 블랙리스트 (page_id 접두사로 매칭)
@@ -53,6 +97,21 @@ NOISE_SELECTORS = [
     {"class": "pageId"},        # 페이지 ID 표시 (breadcrumb 잔여)
 ]
 
+# NOISE_SELECTORS를 CSS 선택자 하나로 합친 것 (트리 1회 순회로 전체 노이즈 탐색)
+NOISE_CSS = ", ".join(
+    f".{sel['class']}" if "class" in sel else f"#{sel['id']}"
+    for sel in NOISE_SELECTORS
+)
+
+# 요소별 노이즈 판정용 class/id 집합 (O(1) 멤버십 검사)
+NOISE_CLASSES = frozenset(sel["class"] for sel in NOISE_SELECTORS if "class" in sel)
+NOISE_IDS = frozenset(sel["id"] for sel in NOISE_SELECTORS if "id" in sel)
+# 제목 추출 시 건너뛸 TOC 컨테이너 class
+TOC_CLASSES = frozenset({"toc", "dw__toc"})
+
+# 헤딩 태그 → Markdown 레벨
+HEADING_LEVELS = {f"h{level}": level for level in range(1, 7)}
+
 
 def get_page_id(url):
     """URL에서 DokuWiki page ID를 추출한다. (예: 'gamemanual:gm_sales')"""
@@ -83,38 +142,32 @@ def is_valid_url(url):
     return True
 
 
-def clean_text(text):
-    """지저분한 공백 정리: 연속 공백은 하나로, 연속 빈 줄은 두 줄까지만 허용."""
-    text = re.sub(r"[ \t]+", " ", text)          # 가로 공백 정리
-    text = re.sub(r"\n{3,}", "\n\n", text)       # 3줄 이상 빈 줄 → 2줄
-    return text.strip()
-
-
 def strip_anchor(url):
     """URL에서 #앵커 부분을 제거한다."""
     parsed = urlparse(url)
     return parsed._replace(fragment="").geturl()
 
 
-def extract_title(soup, url):
+def extract_title(content, url):
     """
-    페이지 고유 제목을 추출한다.
+    페이지 고유 제목을 추출한다. content는 #dokuwiki__content 노드 (없으면 None).
     우선순위: 본문 내 첫 h1/h2/h3 (TOC 제외) → URL의 id 파라미터 → 'No Title'
     """
-    content = soup.find(id="dokuwiki__content")
     if content:
         for heading in content.find_all(["h1", "h2", "h3"]):
             # TOC 내부 헤딩은 건너뛴다
-            if heading.find_parent(class_="toc") or heading.find_parent(class_="dw__toc"):
+            if heading.find_parent(lambda tag: not TOC_CLASSES.isdisjoint(tag.get("class") or ())):
                 continue
             text = heading.get_text(strip=True)
             if text:
                 return text
 
-    # fallback: URL의 id= 파라미터에서 추출
-    parsed = urlparse(url)
-    qs = parse_qs(parsed.query)
-    page_id = qs.get("id", [""])[0]
+    return title_from_url(url)
+
+
+def title_from_url(url):
+    """URL의 id= 파라미터에서 제목을 만든다. 본문 헤딩이 없을 때의 fallback."""
+    page_id = get_page_id(url)
     if page_id:
         # "gamemanual:howto_vehiclepricing" → "Howto Vehiclepricing"
         name = page_id.split(":")[-1]
@@ -125,164 +178,591 @@ def extract_title(soup, url):
 
 def table_to_markdown(table_tag):
     """HTML <table>을 Markdown 테이블 문자열로 변환한다."""
-    rows = []
-    for tr in table_tag.find_all("tr"):
-        cells = []
-        for cell in tr.find_all(["th", "td"]):
-            cells.append(cell.get_text(strip=True))
-        if cells:
-            rows.append(cells)
-
-    if not rows:
-        return ""
-
-    # 열 수 통일
-    max_cols = max(len(r) for r in rows)
-    for r in rows:
-        while len(r) < max_cols:
-            r.append("")
-
-    lines = []
-    header = "| " + " | ".join(rows[0]) + " |"
-    separator = "| " + " | ".join("---" for _ in rows[0]) + " |"
-    lines.append(header)
-    lines.append(separator)
-    for row in rows[1:]:
-        lines.append("| " + " | ".join(row) + " |")
-
-    return "\n".join(lines)
-
-
-def extract_content(soup):
+    return rows_to_markdown([
+        [cell.get_text(strip=True) for cell in tr.find_all(["th", "td"])]
+        for tr in table_tag.find_all("tr")
+    ])
+
+
+def _is_noise(el):
+    """NOISE_SELECTORS 중 하나에 해당하는 요소인지 확인한다."""
+    return el.get("id") in NOISE_IDS or not NOISE_CLASSES.isdisjoint(el.get("class") or ())
+
+
+def extract_content(content):
     """
-    본문 영역(#dokuwiki__content)에서 노이즈를 제거하고,
-    테이블은 Markdown으로 변환하여 깨끗한 텍스트를 반환한다.
+    본문 노드(#dokuwiki__content 또는 div.dokuwiki)에서 노이즈를 제거하고,
+    테이블은 Markdown으로 변환하여 깨끗한 텍스트를 반환한다. content를 직접 변형한다.
     """
-    content = soup.find(id="dokuwiki__content")
-    if not content:
-        # fallback
-        content = soup.find("div", {"class": "dokuwiki"})
-    if not content:
-        return None
+    # 본문 트리를 문서 순서로 한 번만 순회하며 태그별로 변형한다.
+    # 치환/제거한 노드는 decompose로 하위 노드까지 표시해 두고 순회 중 건너뛴다.
+    for el in content.find_all(True):
+        if el.decomposed:
+            continue
+        name = el.name
+        if _is_noise(el):
+            # 노이즈 요소 제거
+            el.decompose()
+        elif name == "table":
+            # <table>을 Markdown 텍스트 노드로 치환 (셀 안의 노이즈는 먼저 제거)
+            for noise in el.find_all(_is_noise):
+                if not noise.decomposed:
+                    noise.decompose()
+            el.replace_with(table_to_markdown(el))
+            el.decompose()
+        elif name in HEADING_LEVELS:
+            # 헤딩에 줄바꿈을 넣어 구조를 유지
+            prefix = "#" * HEADING_LEVELS[name]
+            el.replace_with(f"\n\n{prefix} {el.get_text(strip=True)}\n")
+            el.decompose()
+        elif name == "li":
+            # <li>에 bullet 추가
+            el.insert(0, "- ")
+            el.append("\n")
+        elif name == "br":
+            # <br> → 줄바꿈
+            el.replace_with("\n")
+
+    # 마지막에 남는 DokuWiki 푸터 잔여물 제거 + 공백 정리
+    return finalize_text(content.get_text())
+
+
+# ── selectolax (Lexbor) 백엔드 ───────────────────────────────────
+
+def _has_ancestor_class(node, classes):
+    """조상 노드 중 classes에 속한 class를 가진 노드가 있는지 확인한다."""
+    parent = node.parent
+    while parent is not None:
+        if not classes.isdisjoint((parent.attributes.get("class") or "").split()):
+            return True
+        parent = parent.parent
+    return False
+
+
+def extract_title_lexbor(content, url):
+    """extract_title의 selectolax 버전. content는 #dokuwiki__content 노드 (없으면 None)."""
+    if content is not None:
+        for heading in content.css("h1, h2, h3"):
+            # TOC 내부 헤딩은 건너뛴다
+            if _has_ancestor_class(heading, TOC_CLASSES):
+                continue
+            text = heading.text(strip=True)
+            if text:
+                return text
+
+    return title_from_url(url)
 
-    # 노이즈 요소 제거
-    for selector in NOISE_SELECTORS:
-        for tag in content.find_all(**selector):
-            tag.decompose()
+
+def table_to_markdown_lexbor(table_node):
+    """table_to_markdown의 selectolax 버전."""
+    return rows_to_markdown([
+        [cell.text(strip=True) for cell in tr.css("th, td")]
+        for tr in table_node.css("tr")
+    ])
+
+
+def extract_content_lexbor(content):
+    """
+    extract_content의 selectolax 버전. content(본문 노드)를 직접 변형한다.
+    노이즈는 CSS 선택자 1회로 찾아 제거하고, 헤딩/li/br은 한 번의 순회로 처리한다.
+    """
+    # 노이즈 요소 제거 — 이미 제거될 조상이 있는 노드는 건너뛴다
+    noise = content.css(NOISE_CSS)
+    noise_ids = {n.mem_id for n in noise}
+    for node in noise:
+        parent = node.parent
+        while parent is not None and parent.mem_id not in noise_ids:
+            parent = parent.parent
+        if parent is None:
+            node.decompose()
 
     # <table>을 Markdown 텍스트 노드로 치환
-    for table in content.find_all("table"):
-        md_table = table_to_markdown(table)
-        table.replace_with(md_table)
-
-    # 헤딩에 줄바꿈을 넣어 구조를 유지
-    for level in range(1, 7):
-        for h in content.find_all(f"h{level}"):
-            prefix = "#" * level
-            h.replace_with(f"\n\n{prefix} {h.get_text(strip=True)}\n")
-
-    # <li>에 bullet 추가
-    for li in content.find_all("li"):
-        li.insert(0, "- ")
-        li.append("\n")
-
-    # <br> → 줄바꿈
-    for br in content.find_all("br"):
-        br.replace_with("\n")
-
-    raw = content.get_text()
-
-    # 마지막에 남는 DokuWiki 푸터 잔여물 제거
-    raw = re.sub(
-        r"\S+\.txt\s*·\s*Last modified:.*$",
-        "", raw, flags=re.DOTALL,
-    )
+    for table in content.css("table"):
+        table.replace_with(table_to_markdown_lexbor(table))
 
-    return clean_text(raw)
+    # 헤딩/li/br을 문서 순서대로 한 번에 처리
+    for node in content.css("h1, h2, h3, h4, h5, h6, li, br"):
+        tag = node.tag
+        if tag == "li":
+            node.insert_before("- ")
+            node.insert_after("\n")
+        elif tag == "br":
+            node.replace_with("\n")
+        else:
+            prefix = "#" * int(tag[1])
+            node.replace_with(f"\n\n{prefix} {node.text(strip=True)}\n")
 
+    # 마지막에 남는 DokuWiki 푸터 잔여물 제거 + 공백 정리
+    return finalize_text(content.text(deep=True, separator="", strip=False))
 
-def save_progress(wiki_data, output_file):
-    """수집된 데이터를 중간 저장한다."""
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(wiki_data, f, ensure_ascii=False, indent=2)
 
+def _parse_page_lexbor(html, url, collect_links):
+    tree = LexborHTMLParser(html)
+    # 제목은 #dokuwiki__content에서만 찾는다 (div.dokuwiki에는 사이트 헤더가 들어 있음) — bs4 경로와 동일
+    main = tree.css_first("#dokuwiki__content")
+    content = main or tree.css_first("div.dokuwiki")
 
-def crawl(start_url, max_depth=None, output_file=OUTPUT_FILE):
+    title_text = extract_title_lexbor(main, url)
+    if content is None:
+        return title_text, [], None
+
+    # 링크를 먼저 수집 (extract_content_lexbor가 노드를 변형하므로)
+    found_links = []
+    if collect_links:
+        found_links = harvest_links((a.attributes["href"] for a in content.css("a[href]")), url)
+
+    return title_text, found_links, extract_content_lexbor(content)
+
+
+def _parse_page_bs4(html, url, collect_links):
+    soup = BeautifulSoup(html, HTML_PARSER)
+    # 본문 노드는 한 번만 찾아 제목/링크/본문 추출에 함께 쓴다
+    main = soup.find(id="dokuwiki__content")
+    content = main or soup.find("div", {"class": "dokuwiki"})
+
+    title_text = extract_title(main, url)
+    if content is None:
+        return title_text, [], None
+
+    # 링크를 먼저 수집 (extract_content가 노드를 변형하므로)
+    found_links = []
+    if collect_links:
+        found_links = harvest_links((a["href"] for a in content.find_all("a", href=True)), url)
+
+    return title_text, found_links, extract_content(content)
+
+
+def harvest_links(hrefs, url):
+    """본문 링크의 href 목록을 절대 URL로 바꾸고(#앵커 제거) 수집 대상만 남긴다."""
+    found_links = []
+    for href in hrefs:
+        full_url = strip_anchor(urljoin(url, href))
+        if is_valid_url(full_url):
+            found_links.append(full_url)
+    return found_links
+
+
+def parse_page(html, url, collect_links=True):
     """
-    BFS 방식으로 위키를 크롤링한다.
-    max_depth: None이면 전체 크롤링, 숫자면 해당 깊이까지만 탐색.
-               depth 0 = start_url만, 1 = start_url + 거기서 발견된 링크, ...
+    HTML → (제목, 본문 내 유효 링크 목록, 정리된 본문 텍스트).
+    HTML_BACKEND에 따라 selectolax 또는 BeautifulSoup 경로를 사용한다.
+    """
+    if HTML_BACKEND == "selectolax":
+        return _parse_page_lexbor(html, url, collect_links)
+    return _parse_page_bs4(html, url, collect_links)
+
+
+def _init_parse_worker(backend, ignore_prefixes, ignore_pages):
+    """파싱 프로세스 초기화: CLI로 바꾼 백엔드/필터 설정을 워커 프로세스에도 반영한다."""
+    global HTML_BACKEND
+    HTML_BACKEND = backend
+    IGNORE_PREFIXES[:] = ignore_prefixes
+    IGNORE_PAGES.clear()
+    IGNORE_PAGES.update(ignore_pages)
+
+
+class NearDuplicateFilter:
+    """
+    MinHash-LSH 기반 near-duplicate 페이지 감지기.
+    본문의 문자 5-gram shingle로 MinHash를 만들고, 기존 페이지와 Jaccard 유사도가
+    DEDUP_THRESHOLD 이상이면 중복으로 판정한다. 상태는 pickle로 저장해 재크롤링에도 유지.
+    """
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        if os.path.exists(state_path):
+            with open(state_path, "rb") as f:
+                self._lsh = pickle.load(f)
+        else:
+            self._lsh = MinHashLSH(threshold=DEDUP_THRESHOLD, num_perm=DEDUP_NUM_PERM)
+
+    @staticmethod
+    def _minhash(text):
+        m = MinHash(num_perm=DEDUP_NUM_PERM)
+        n = DEDUP_SHINGLE_SIZE
+        m.update_batch([text[i:i + n].encode("utf-8") for i in range(max(1, len(text) - n + 1))])
+        return m
+
+    def check(self, url, text):
+        """중복이면 원본 URL을, 아니면 None을 반환하고 이 페이지를 인덱스에 추가한다."""
+        m = self._minhash(text)
+        for other in self._lsh.query(m):
+            if other != url:
+                return other
+        if url not in self._lsh:
+            self._lsh.insert(url, m)
+        return None
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path, "wb") as f:
+            pickle.dump(self._lsh, f)
+
+
+def sidecar_path(output_file, suffix):
+    """출력 JSON 옆에 두는 보조 파일 경로. (예: gearcity_wiki_data.jsonl)"""
+    return os.path.splitext(output_file)[0] + suffix
+
+
+class CrawlState:
+    """
+    shelve 기반 크롤 진행 상태 (URL → (depth, done)).
+    링크를 큐에 넣을 때 기록하고 처리가 끝나면 done으로 표시하므로,
+    중단된 크롤은 done이 아닌 URL부터 다시 시작할 수 있다.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = shelve.open(path)
+
+    def done_urls(self):
+        """처리가 끝난 URL을 하나씩 yield 한다 (전체를 메모리에 올리지 않음)."""
+        for url, (_, done) in self._db.items():
+            if done:
+                yield url
+
+    def is_done(self, url):
+        entry = self._db.get(url)
+        return entry is not None and entry[1]
+
+    def pending(self):
+        """처리되지 않은 (url, depth) 목록 (depth 오름차순 — BFS 순서 유지)."""
+        return sorted(
+            ((url, depth) for url, (depth, done) in self._db.items() if not done),
+            key=lambda x: x[1],
+        )
+
+    def add(self, url, depth):
+        if url not in self._db:
+            self._db[url] = (depth, False)
+
+    def mark_done(self, url, depth):
+        self._db[url] = (depth, True)
+
+    def sync(self):
+        self._db.sync()
+
+    def close(self):
+        self._db.close()
+
+
+class VisitedFilter:
+    """
+    방문한 URL 집합. Bloom 필터로 처음 보는 URL을 메모리 ~10bit/URL로 빠르게 걸러내고,
+    Bloom 양성(오탐 가능)은 진행 중인 URL 집합과 CrawlState의 done 기록으로 확인한다.
+    """
+
+    def __init__(self, state):
+        self._state = state
+        if _HAS_PYBLOOM:
+            self._bloom = ScalableBloomFilter(initial_capacity=10_000, error_rate=1e-4)
+        else:
+            self._bloom = set()
+        self._inflight = set()  # 요청했지만 아직 done으로 기록되지 않은 URL
+        self.done_count = 0
+        for url in state.done_urls():
+            self._bloom.add(url)
+            self.done_count += 1
+
+    def __contains__(self, url):
+        if url not in self._bloom:
+            return False
+        return url in self._inflight or self._state.is_done(url)
+
+    def add(self, url):
+        self._bloom.add(url)
+        self._inflight.add(url)
+
+    def mark_done(self, url, depth):
+        self._state.mark_done(url, depth)
+        self._inflight.discard(url)
+
+
+class PageCache:
+    """
+    shelve 기반 조건부 GET 캐시 (URL → ETag/Last-Modified/본문 해시 + 파싱 결과).
+    다음 크롤에서 If-None-Match/If-Modified-Since를 보내 304를 받으면
+    다운로드와 파싱을 모두 건너뛰고 저장해 둔 결과를 재사용한다.
+    --fresh로 진행 상태를 지워도 유지되므로, 재크롤은 변경된 페이지만 다시 받는다.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = shelve.open(path)
+
+    def get(self, url):
+        return self._db.get(url)
+
+    @staticmethod
+    def validators(entry):
+        """캐시 항목으로 조건부 요청 헤더를 만든다."""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, validators, digest, title, links, content):
+        self._db[url] = {
+            "etag": validators.get("etag"),
+            "last_modified": validators.get("last-modified"),
+            "sha256": digest,
+            "title": title,
+            "links": links,
+            "content": content,
+        }
+
+    def sync(self):
+        self._db.sync()
+
+    def close(self):
+        self._db.close()
+
+
+class HostBucket:
+    """
+    호스트별 요청 간격 제어 (토큰 버킷). gap초마다 토큰이 하나 쌓이고 최대 burst개까지 모인다.
+    burst=1이면 요청 발행 간격을 gap으로 고정하는 기존 매너 딜레이와 같다.
     """
-    visited = set()
-    wiki_data = []
-    # (url, depth) 튜플로 관리
-    queue = deque([(start_url, 0)])
 
-    while queue:
-        url, depth = queue.popleft()
+    def __init__(self, gap, burst=1):
+        self.gap = gap
+        self.burst = max(1, burst)
+        self.next = 0.0  # 다음 토큰을 쓸 수 있는 시각 (monotonic)
+
+    async def acquire(self):
+        now = time.monotonic()
+        wait = self.next - now
+        if wait > 0:
+            await asyncio.sleep(wait)
+        # 오래 쉬었으면 burst개까지만 토큰을 모아 둔다
+        self.next = max(now - (self.burst - 1) * self.gap, self.next) + self.gap
+
+    def refund(self):
+        """서버 부담이 거의 없는 요청(304)은 토큰을 돌려받아 다음 요청을 기다리지 않는다."""
+        self.next -= self.gap
+
+
+async def load_crawl_delay(client, start_url):
+    """robots.txt의 Crawl-delay(초)를 읽는다. 없거나 받을 수 없으면 None."""
+    parsed = urlparse(start_url)
+    robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+    try:
+        response = await client.get(robots_url)
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    robots = RobotFileParser(robots_url)
+    robots.parse(response.text.splitlines())
+    delay = robots.crawl_delay(USER_AGENT)
+    return float(delay) if delay is not None else None
+
+
+async def _fetcher(client, frontier, parse_queue, visited, max_depth, cache, buckets):
+    """
+    frontier에서 URL을 하나씩 꺼내 순차적으로 요청한다 (호스트당 1개 요청).
+    요청 발행 간격은 호스트별 HostBucket으로 조절하고, 받은 HTML은 parse_queue로 넘긴다.
+    캐시에 있는 URL은 조건부 GET으로 요청하고, 304면 HTML 없이 캐시 항목만 넘긴다.
+    """
+    fetched = 0
+    while True:
+        url, depth = await frontier.get()
         if url in visited:
+            frontier.task_done()
             continue
         visited.add(url)
 
-        depth_tag = f"d{depth}" if max_depth is not None else ""
-        print(f"[{len(wiki_data)+1}] {depth_tag} Crawling: {url}  (queue: {len(queue)})")
-
+        # URL 하나의 실패(잘못된 URL 등 httpx 밖의 예외 포함)가 유일한 fetcher 태스크를 죽이면
+        # 남은 URL이 task_done() 되지 않아 frontier.join()이 영원히 기다린다
         try:
-            response = requests.get(
-                url,
-                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'},
-                timeout=REQUEST_TIMEOUT,
-            )
+            # 매너 딜레이: 호스트 버킷에 토큰이 있어야 다음 요청
+            bucket = buckets[urlparse(url).netloc]
+            await bucket.acquire()
+
+            fetched += 1
+            depth_tag = f"d{depth}" if max_depth is not None else ""
+            print(f"[{fetched}] {depth_tag} Crawling: {url}  (queue: {frontier.qsize()})")
+
+            cached = cache.get(url)
+            response = await client.get(url, headers=cache.validators(cached))
+            if response.status_code == 304 and cached:
+                print("  Not modified (304), reusing cached page.")
+                bucket.refund()
+                await parse_queue.put((url, depth, None, None, cached))
+                continue
             if response.status_code != 200:
                 print(f"  Failed: {response.status_code}")
+                visited.mark_done(url, depth)
+                frontier.task_done()
                 continue
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            validators = {k: response.headers.get(k) for k in ("etag", "last-modified")}
+            await parse_queue.put((url, depth, response.content, validators, cached))
+        except Exception as e:
+            print(f"  Error: {e}")
+            visited.mark_done(url, depth)
+            frontier.task_done()
 
-            # 1. 제목 추출 (페이지 고유 제목)
-            title_text = extract_title(soup, url)
 
-            # 2. 링크를 먼저 수집 (extract_content가 soup를 변형하므로)
-            found_links = []
-            if max_depth is None or depth < max_depth:
-                content_for_links = soup.find(id="dokuwiki__content") or soup.find("div", {"class": "dokuwiki"})
-                if content_for_links:
-                    for link in content_for_links.find_all("a", href=True):
-                        full_url = strip_anchor(urljoin(url, link["href"]))
-                        if is_valid_url(full_url) and full_url not in visited:
-                            found_links.append(full_url)
+async def _parse_worker(pool, frontier, parse_queue, visited, max_depth, sink, state, cache, dup_filter, stats):
+    """parse_queue의 HTML을 프로세스 풀에서 파싱하고, 결과를 JSONL에 추가 + 링크를 frontier에 추가한다."""
+    loop = asyncio.get_running_loop()
+    while True:
+        url, depth, html, validators, cached = await parse_queue.get()
+        try:
+            # 1~3. 제목/링크/본문 추출. 304이거나 본문 해시가 같으면 캐시된 결과를 재사용
+            digest = hashlib.sha256(html).hexdigest() if html is not None else None
+            if cached and (html is None or cached["sha256"] == digest):
+                title_text, found_links, body_text = cached["title"], cached["links"], cached["content"]
+                stats["cached"] += 1
+            else:
+                # bytes를 넘겨 파서가 인코딩을 직접 판별. 링크는 캐시 재사용을 위해 깊이와 무관하게 수집
+                title_text, found_links, body_text = await loop.run_in_executor(pool, parse_page, html, url)
+            if html is not None:
+                cache.store(url, validators, digest, title_text, found_links, body_text)
+            dup_of = dup_filter.check(url, body_text) if body_text and dup_filter else None
+            if dup_of:
+                print(f"  Near-duplicate of {dup_of}, skipped.")
+            elif body_text:
+                # 4. 데이터 저장 (JSONL에 한 줄 추가 — 전체 재직렬화 없음)
+                page_data = {
+                    "url": url,
+                    "title": title_text,
+                    "depth": depth,
+                    "content": body_text,
+                }
+                sink.write(dumps_line(page_data))
+                sink.flush()
+                stats["saved"] += 1
+
+                # 5. 진행 상태 동기화 (10페이지마다)
+                if stats["saved"] % 10 == 0:
+                    state.sync()
+                    cache.sync()
+                    if dup_filter:
+                        dup_filter.save()
+                    print(f"  [Checkpoint] {stats['saved']} pages saved.")
+
+            # 6. 수집한 링크를 큐에 추가 (중복 페이지라도 링크는 따라간다)
+            if body_text and (max_depth is None or depth < max_depth):
+                for link_url in found_links:
+                    if link_url not in visited:
+                        state.add(link_url, depth + 1)
+                        frontier.put_nowait((link_url, depth + 1))
+            visited.mark_done(url, depth)
+        except Exception as e:
+            print(f"  Error: {e}")
+        finally:
+            parse_queue.task_done()
+            frontier.task_done()
 
-            # 3. 본문 추출 (노이즈 제거 + 테이블 Markdown 변환)
-            body_text = extract_content(soup)
-            if not body_text:
-                continue
 
-            # 4. 데이터 저장
-            page_data = {
-                "url": url,
-                "title": title_text,
-                "depth": depth,
-                "content": body_text,
-            }
-            wiki_data.append(page_data)
-
-            # 5. 중간 저장 (10페이지마다)
-            if len(wiki_data) % 10 == 0:
-                save_progress(wiki_data, output_file)
-                print(f"  [Checkpoint] {len(wiki_data)} pages saved.")
-
-            # 6. 수집한 링크를 큐에 추가
-            for link_url in found_links:
-                if link_url not in visited:
-                    queue.append((link_url, depth + 1))
+async def crawl_async(start_url, max_depth=None, output_file=OUTPUT_FILE, dedup=True):
+    """
+    crawl()의 비동기 구현. 요청은 DELAY 간격으로 순차 발행하되,
+    페이지 N의 파싱(워커 프로세스)과 페이지 N+1의 요청이 겹치도록 파이프라인화한다.
+    """
+    state = CrawlState(sidecar_path(output_file, ".state"))
+    visited = VisitedFilter(state)
+    pending = state.pending()
+    if not pending and start_url not in visited:
+        state.add(start_url, 0)
+        pending = [(start_url, 0)]
+    elif pending:
+        print(f"[Resume] {visited.done_count} done, {len(pending)} pending.")
+    else:
+        print("[Resume] Nothing left to crawl. Use --fresh to start over.")
+
+    # (url, depth) 튜플로 관리. 항목 하나가 fetch → parse → 링크 추가까지 끝나야 task_done
+    frontier = asyncio.Queue()
+    for item in pending:
+        frontier.put_nowait(item)
+    parse_queue = asyncio.Queue(maxsize=PARSE_WORKERS * 2)
+    # LSH 상태는 출력 JSON 옆에 저장 (예: gearcity_wiki_data.lsh.pkl)
+    dup_filter = None
+    if dedup and _HAS_DATASKETCH:
+        dup_filter = NearDuplicateFilter(sidecar_path(output_file, ".lsh.pkl"))
+    # 조건부 GET 캐시도 출력 JSON 옆에 저장 (예: gearcity_wiki_data.etags)
+    cache = PageCache(sidecar_path(output_file, ".etags"))
+    stats = {"saved": 0, "cached": 0}
+
+    try:
+        # 파싱은 GIL을 피해 별도 프로세스에서 (CLI로 바꾼 백엔드/필터 설정을 함께 전달)
+        pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS,
+            initializer=_init_parse_worker,
+            initargs=(HTML_BACKEND, list(IGNORE_PREFIXES), set(IGNORE_PAGES)),
+        )
+        with pool, open(sidecar_path(output_file, ".jsonl"), "ab") as sink:
+            async with httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT},
+                limits=httpx.Limits(max_keepalive_connections=8, max_connections=8),
+                timeout=REQUEST_TIMEOUT,
+                follow_redirects=True,
+            ) as client:
+                # robots.txt의 Crawl-delay가 DELAY보다 길면 그쪽을 따른다
+                crawl_delay = await load_crawl_delay(client, start_url) if pending else None
+                gap = max(DELAY, crawl_delay or 0.0)
+                if crawl_delay is not None:
+                    print(f"[robots.txt] Crawl-delay: {crawl_delay}s -> request gap {gap}s")
+                buckets = defaultdict(lambda: HostBucket(gap, CRAWL_BURST))
+                tasks = [asyncio.create_task(
+                    _fetcher(client, frontier, parse_queue, visited, max_depth, cache, buckets)
+                )]
+                tasks += [
+                    asyncio.create_task(_parse_worker(
+                        pool, frontier, parse_queue, visited, max_depth,
+                        sink, state, cache, dup_filter, stats,
+                    ))
+                    for _ in range(PARSE_WORKERS)
+                ]
+                try:
+                    await frontier.join()
+                finally:
+                    for t in tasks:
+                        t.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        state.close()
+        cache.close()
+        if dup_filter:
+            dup_filter.save()
+
+    if stats["cached"]:
+        print(f"[Cache] {stats['cached']} unchanged pages reused without parsing.")
+    return stats["saved"]
+
+
+def crawl(start_url, max_depth=None, output_file=OUTPUT_FILE, dedup=True):
+    """
+    BFS 방식으로 위키를 크롤링한다. 이번 실행에서 새로 저장한 페이지 수를 반환.
+    max_depth: None이면 전체 크롤링, 숫자면 해당 깊이까지만 탐색.
+               depth 0 = start_url만, 1 = start_url + 거기서 발견된 링크, ...
+    dedup: True면 near-duplicate 페이지를 저장하지 않는다 (datasketch 필요).
 
-        except Exception as e:
-            print(f"  Error: {e}")
+    페이지는 <output>.jsonl에 한 줄씩 추가되고, 진행 상태는 <output>.state에 기록된다.
+    중단 후 다시 실행하면 남은 URL부터 이어서 크롤링한다. (처음부터: --fresh)
+    <output>.etags의 ETag/Last-Modified로 조건부 GET을 보내 변경 없는 페이지는 재사용한다.
+    """
+    return asyncio.run(crawl_async(start_url, max_depth, output_file, dedup))
 
-        time.sleep(DELAY)
 
-    return wiki_data
+def reset_crawl(output_file):
+    """
+    --fresh: 이전 실행의 JSONL/진행 상태/LSH 파일을 삭제한다.
+    조건부 GET 캐시(.etags)는 남겨 두어, 변경되지 않은 페이지는 304로 재사용한다.
+    """
+    base = os.path.splitext(output_file)[0]
+    directory = os.path.dirname(output_file) or "."
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if path.startswith(base + ".state") or path in (base + ".jsonl", base + ".lsh.pkl"):
+            os.remove(path)
 
 
 def parse_args():
@@ -303,6 +783,18 @@ def parse_args():
         "-o", "--output", default=OUTPUT_FILE,
         help=f"출력 JSON 경로 (default: {OUTPUT_FILE})",
     )
+    parser.add_argument(
+        "--backend", choices=["selectolax", "bs4"], default=HTML_BACKEND,
+        help=f"HTML 파싱 백엔드 (default: {HTML_BACKEND})",
+    )
+    parser.add_argument(
+        "--no-dedup", action="store_true",
+        help="near-duplicate 페이지 제거 비활성화",
+    )
+    parser.add_argument(
+        "--fresh", action="store_true",
+        help="이전 진행 상태를 지우고 처음부터 크롤링",
+    )
     parser.add_argument(
         "--no-filter", action="store_true",
         help="페이지 필터링 비활성화 (모든 페이지 수집)",
@@ -313,6 +805,10 @@ def parse_args():
 if __name__ == "__main__":
     args = parse_args()
     DELAY = args.delay
+    HTML_BACKEND = args.backend
+    if HTML_BACKEND == "selectolax" and not _HAS_SELECTOLAX:
+        print("[Backend] selectolax not installed, falling back to bs4.")
+        HTML_BACKEND = "bs4"
 
     # --no-filter 시 블랙리스트 비우기
     if args.no_filter:
@@ -324,8 +820,12 @@ if __name__ == "__main__":
     filtered = len(IGNORE_PREFIXES) + len(IGNORE_PAGES)
     print(f"--- GearCity Wiki Crawler Start ({depth_str}, {filtered} filter rules) ---")
 
-    wiki_data = crawl(args.url, max_depth=args.depth, output_file=args.output)
+    if not args.no_dedup and not _HAS_DATASKETCH:
+        print("[Dedup] datasketch not installed, near-duplicate removal disabled.")
+    if args.fresh:
+        reset_crawl(args.output)
+    saved = crawl(args.url, max_depth=args.depth, output_file=args.output, dedup=not args.no_dedup)
 
-    # 최종 저장
-    save_progress(wiki_data, args.output)
-    print(f"--- Crawling Finished. Total Pages: {len(wiki_data)} ---")
\ No newline at end of file
+    # 최종 저장: JSONL → JSON 배열 압축
+    total = compact(sidecar_path(args.output, ".jsonl"), args.output)
+    print(f"--- Crawling Finished. New Pages: {saved}, Total Pages: {total} ---")
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+crawler.py가 쌓은 JSONL(페이지당 1줄)을 기존 포맷의 JSON 배열로 압축한다.
+같은 URL이 여러 번 기록된 경우(중단 후 재개 등) 마지막 기록을 사용한다.
+
+Usage:
+    poetry run python jsonl_to_json.py                                   # 기본 경로
+    poetry run python jsonl_to_json.py data/wiki/gearcity_wiki_data.jsonl -o out.json
+"""
+import argparse
+import json
+import os
+
+# orjson(Rust 구현)이 있으면 직렬화에 사용, 없으면 표준 json으로 폴백
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_JSONL = "data/wiki/gearcity_wiki_data.jsonl"
+
+
+def dumps_line(record):
+    """레코드 1개 → JSONL 한 줄 (UTF-8 bytes, 개행 포함)."""
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _loads(line):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def compact(jsonl_path, output_file):
+    """JSONL → JSON 배열. 저장한 페이지 수를 반환한다."""
+    pages = {}
+    if os.path.exists(jsonl_path):
+        with open(jsonl_path, "rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    page = _loads(line)
+                except ValueError:
+                    continue  # 강제 종료로 잘린 마지막 줄 (orjson/json 디코드 에러 모두 ValueError)
+                pages[page["url"]] = page
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    if orjson is not None:
+        with open(output_file, "wb") as f:
+            f.write(orjson.dumps(list(pages.values()), option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(list(pages.values()), f, ensure_ascii=False, indent=2)
+    return len(pages)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compact crawler JSONL into a JSON array")
+    parser.add_argument(
+        "jsonl", nargs="?", default=DEFAULT_JSONL,
+        help=f"입력 JSONL 경로 (default: {DEFAULT_JSONL})",
+    )
+    parser.add_argument(
+        "-o", "--output", default=None,
+        help="출력 JSON 경로 (default: 입력 경로의 .json)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    output = args.output or os.path.splitext(args.jsonl)[0] + ".json"
+    count = compact(args.jsonl, output)
+    print(f"{count} pages → {output}")
@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 """Parse GearCity TurnEvents.xml - comprehensive timeline analysis."""
-import sys, os
-import xml.etree.ElementTree as ET
+import sys, os, operator
+from lxml import etree
 from collections import defaultdict
+import pandas as pd
 from dotenv import load_dotenv
 if sys.platform == "win32": sys.stdout.reconfigure(encoding="utf-8")
 
@@ -13,55 +14,109 @@ DEFAULT_XML_PATH = os.getenv(
     "D:/SteamLibrary/steamapps/common/GearCity/media/Maps/Base City Map/scripts/TurnEvents.xml",
 )
 
-def parse_xml(p):
+def stream_years(p):
+    """<year> 요소를 하나씩 yield 하고, 처리 후 비워서 피크 메모리를 1년치 서브트리로 유지."""
     if not os.path.isfile(p): print("ERROR: not found:",p); sys.exit(1)
-    return ET.parse(p).getroot()
+    for _,ye in etree.iterparse(p,events=("end",),tag="year"):
+        parent=ye.getparent()
+        if parent is None or parent.getparent() is not None:
+            continue  # 루트 직계 <year> 만 대상 (기존 root.findall("year") 와 동일)
+        yield ye
+        ye.clear()
+        while ye.getprevious() is not None:
+            del parent[0]
 
-def collect_econ(root):
-    keys=["buyrate","gas","interest","stockrate","carprice"]
-    amap={"buyrate":"rate","gas":"rate","interest":"global","stockrate":"rate","carprice":"rate"}
-    data={}
-    for ye in root.findall("year"):
-        y=int(ye.get("y")); yd={}
-        for te in sorted(ye.findall("turn"),key=lambda t:int(t.get("t","0"))):
-            for s in ["GameEvts","WorldEvts","NewsEvts"]:
-                sec=te.find(s)
-                if sec is not None:
-                    for k in keys:
-                        if k not in yd:
-                            el=sec.find(k)
-                            if el is not None:
-                                v=el.get(amap[k])
-                                if v: yd[k]=float(v)
-            for k in keys:
-                if k not in yd:
-                    el=te.find(k)
-                    if el is not None:
-                        v=el.get(amap[k])
-                        if v: yd[k]=float(v)
-        data[y]=yd
-    return data
+ECON_KEYS=["buyrate","gas","interest","stockrate","carprice"]
+ECON_ATTR={"buyrate":"rate","gas":"rate","interest":"global","stockrate":"rate","carprice":"rate"}
+ECON_SECTIONS=["GameEvts","WorldEvts","NewsEvts"]
+EVENT_SKIP={"buyrate","gas","interest","stockrate","carprice","vehiclepop",
+            "office","pensionGrowth","comment","WorldEvts","NewsEvts",
+            "GameEvts","turn","year","Evts"}
 
-def collect_events(root):
-    gov,war,news,other=[],[],[],[]
-    skip={"buyrate","gas","interest","stockrate","carprice","vehiclepop",
-          "office","pensionGrowth","comment","WorldEvts","NewsEvts",
-          "GameEvts","turn","year","Evts"}
-    for ye in root.findall("year"):
+# XPath 는 한 번만 컴파일해서 재사용 (평가는 lxml C 레벨에서 수행)
+_XP_TURNS=etree.XPath("./turn")
+# 키별 후보 경로: 우선순위 GameEvts > WorldEvts > NewsEvts > turn 직계 자식.
+# XPath union 은 문서 순서로 합쳐지므로 우선순위 유지를 위해 경로를 나눠서 평가
+_XP_ECON={
+    k:[etree.XPath(f"./{s}[1]/{k}[1]/@{ECON_ATTR[k]}") for s in ECON_SECTIONS]
+      +[etree.XPath(f"./{k}[1]/@{ECON_ATTR[k]}")]
+    for k in ECON_KEYS
+}
+# 경제 지표/섹션 태그를 제외한 turn 하위 이벤트 요소 (comment 는 뉴스로 수집, 문서 순서)
+_XP_TURN_EVENTS=etree.XPath(
+    ".//*[not("+" or ".join(f"self::{t}" for t in sorted(EVENT_SKIP-{"comment"}))+")]"
+)
+
+def collect_year_econ(ye):
+    yd={}
+    for te in sorted(_XP_TURNS(ye),key=lambda t:int(t.get("t","0"))):
+        for k in ECON_KEYS:
+            if k in yd: continue
+            for xp in _XP_ECON[k]:
+                hit=xp(te)
+                if hit and hit[0]:
+                    yd[k]=float(hit[0]); break
+        if len(yd)==len(ECON_KEYS): break
+    return yd
+
+def make_event(el,y,t,tag=None):
+    """이벤트 dict 생성. 수천 번 반복되는 속성 키/태그 문자열은 intern 해서 한 객체로 공유."""
+    e={"year":y,"turn":t}
+    if tag is not None: e["tag"]=tag
+    for k,v in el.attrib.items(): e[sys.intern(k)]=v
+    return e
+
+def collect_year_events(ye,y,gov,war,news,other):
+    for te in _XP_TURNS(ye):
+        t=int(te.get("t"))
+        for el in _XP_TURN_EVENTS(te):
+            tag=el.tag
+            if tag=="govern": gov.append(make_event(el,y,t))
+            elif tag=="war": war.append(make_event(el,y,t))
+            elif tag=="comment": news.append(make_event(el,y,t))
+            else:
+                tag=sys.intern(tag)
+                other[tag].append(make_event(el,y,t,tag))
+
+def collect_timeline(p):
+    """XML 을 한 번만 스트리밍하며 연도 목록, 턴 수, 경제 지표, 이벤트를 함께 수집."""
+    yn,tt,econ=[],0,{}
+    gov,war,news=[],[],[]
+    other=defaultdict(list)  # tag -> 이벤트 목록 (태그별 그룹핑을 수집 시점에 한 번만)
+    for ye in stream_years(p):
         y=int(ye.get("y"))
-        for te in ye.findall("turn"):
-            t=int(te.get("t"))
-            for el in te.iter():
-                tag=el.tag
-                if tag=="govern":
-                    e={"year":y,"turn":t};e.update(el.attrib);gov.append(e)
-                elif tag=="war":
-                    e={"year":y,"turn":t};e.update(el.attrib);war.append(e)
-                elif tag=="comment":
-                    e={"year":y,"turn":t};e.update(el.attrib);news.append(e)
-                elif tag not in skip:
-                    e={"year":y,"turn":t,"tag":tag};e.update(el.attrib);other.append(e)
-    return gov,war,news,other
+        yn.append(y)
+        tt+=len(_XP_TURNS(ye))
+        econ[y]=collect_year_econ(ye)
+        collect_year_events(ye,y,gov,war,news,other)
+    return yn,tt,econ,(gov,war,news,other)
+
+# (key, 비교, 임계값, 극값 함수, 섹션 제목, 출력 라벨)
+REGIME_RULES=[
+    ("buyrate",operator.lt,0.90,min,"Economic Downturns (buyrate < 0.90)","Buyrate trough"),
+    ("gas",operator.gt,2.0,max,"Gas Price Spikes (gas > 2.0)","Gas peak"),
+    ("interest",operator.gt,1.06,max,"Interest Rate Spikes (interest > 1.06)","Interest peak"),
+    ("stockrate",operator.lt,0.90,min,"Stock Market Downturns (stockrate < 0.90)","Stock trough"),
+]
+
+def econ_frame(ec):
+    """연도별 경제 지표 dict 를 연도 인덱스 DataFrame 으로 변환 (없는 값은 NaN)."""
+    return pd.DataFrame.from_dict(ec,orient="index").reindex(index=sorted(ec),columns=ECON_KEYS)
+
+def detect_regimes(col,cmp,thr,red,last_year):
+    """임계값을 넘는 연속 구간 목록 [(start, end, extremum)].
+
+    결측 연도는 구간을 끊지 않고, 구간의 끝은 다음 관측 연도 - 1 (진행 중이면 last_year).
+    """
+    s=col.dropna()
+    m=cmp(s,thr)
+    if not m.any(): return []
+    years=s.index.to_series()
+    nxt=years.shift(-1,fill_value=last_year+1)
+    gid=(m!=m.shift()).cumsum()[m]
+    g=pd.DataFrame({"y":years[m],"v":s[m],"nxt":nxt[m]}).groupby(gid,sort=False)
+    agg=g.agg(start=("y","first"),ext=("v",red.__name__),nxt=("nxt","last"))
+    return [(int(st),int(nx)-1,ext) for st,ext,nx in agg.itertuples(index=False)]
 
 MONTHS=["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
 def t2m(t):
@@ -94,14 +149,9 @@ def main(xml_path: str | None = None):
     print(SEP)
     print("Source:",path)
     print()
-    root=parse_xml(path)
-    yels=root.findall("year")
-    yn=[int(y.get("y")) for y in yels]
-    tt=sum(len(y.findall("turn")) for y in yels)
+    yn,tt,ec,(govs,wars,nws,others)=collect_timeline(path)
     print(f"Years: {min(yn)} to {max(yn)} ({len(yn)} years), {tt} total turns")
     print()
-    ec=collect_econ(root)
-    govs,wars,nws,others=collect_events(root)
 
     print(SEP)
     print("PART 1: YEAR-BY-YEAR ECONOMIC SNAPSHOT (Turn 1 / Jan, fallback to later turns)")
@@ -179,14 +229,12 @@ def main(xml_path: str | None = None):
         print("  No <war> elements found.")
         print()
     if others:
-        tags=defaultdict(int)
-        for o in others: tags[o["tag"]]+=1
+        tags={tag:len(v) for tag,v in others.items()}
         print("--- Other Event Types ---")
         for tag,cnt in sorted(tags.items(),key=lambda x:-x[1]):
             print(f"  <{tag}>: {cnt} occurrences")
         print()
-        for tag in sorted(tags):
-            all_of=[o for o in others if o["tag"]==tag]
+        for tag,all_of in sorted(others.items()):
             samps=all_of[:5]
             print(f"  <{tag}> samples (up to 5 of {len(all_of)}):")
             for sv in samps:
@@ -202,90 +250,36 @@ def main(xml_path: str | None = None):
     print(SEP)
     print()
     ys=sorted(ec)
-    # Downturns
-    print("--- Economic Downturns (buyrate < 0.90) ---")
-    ind=False;ds=None;dm=None;dts=[]
-    for y in ys:
-        br=ec[y].get("buyrate")
-        if br is not None:
-            if br<0.90 and not ind: ind=True;ds=y;dm=br
-            elif br<0.90 and ind: dm=min(dm,br)
-            elif br>=0.90 and ind: dts.append((ds,y-1,dm));ind=False
-    if ind: dts.append((ds,ys[-1],dm))
-    if dts:
-        for s,e,m in dts:
-            sp=f"{s}-{e}" if s!=e else str(s)
-            print(f"  [{sp:>12}] Buyrate trough: {m:.4f}")
-    else: print("  None detected.")
-    print()
-    print("--- Gas Price Spikes (gas > 2.0) ---")
-    ins=False;ss=None;sm=None;sps=[]
-    for y in ys:
-        g=ec[y].get("gas")
-        if g is not None:
-            if g>2.0 and not ins: ins=True;ss=y;sm=g
-            elif g>2.0 and ins: sm=max(sm,g)
-            elif g<=2.0 and ins: sps.append((ss,y-1,sm));ins=False
-    if ins: sps.append((ss,ys[-1],sm))
-    if sps:
-        for s,e,m in sps:
-            sp=f"{s}-{e}" if s!=e else str(s)
-            print(f"  [{sp:>12}] Gas peak: {m:.4f}")
-    else: print("  None detected.")
-    print()
-    print("--- Interest Rate Spikes (interest > 1.06) ---")
-    ini=False;i2s=None;im=None;isp=[]
-    for y in ys:
-        r=ec[y].get("interest")
-        if r is not None:
-            if r>1.06 and not ini: ini=True;i2s=y;im=r
-            elif r>1.06 and ini: im=max(im,r)
-            elif r<=1.06 and ini: isp.append((i2s,y-1,im));ini=False
-    if ini: isp.append((i2s,ys[-1],im))
-    if isp:
-        for s,e,m in isp:
-            sp=f"{s}-{e}" if s!=e else str(s)
-            print(f"  [{sp:>12}] Interest peak: {m:.4f}")
-    else: print("  None detected.")
-    print()
-    print("--- Stock Market Downturns (stockrate < 0.90) ---")
-    inc=False;c2s=None;cm=None;crs=[]
-    for y in ys:
-        sr=ec[y].get("stockrate")
-        if sr is not None:
-            if sr<0.90 and not inc: inc=True;c2s=y;cm=sr
-            elif sr<0.90 and inc: cm=min(cm,sr)
-            elif sr>=0.90 and inc: crs.append((c2s,y-1,cm));inc=False
-    if inc: crs.append((c2s,ys[-1],cm))
-    if crs:
-        for s,e,m in crs:
-            sp=f"{s}-{e}" if s!=e else str(s)
-            print(f"  [{sp:>12}] Stock trough: {m:.4f}")
-    else: print("  None detected.")
-    print()
+    df=econ_frame(ec)
+    for (k,cmp,thr,red,title,label) in REGIME_RULES:
+        spans=detect_regimes(df[k],cmp,thr,red,ys[-1])
+        print(f"--- {title} ---")
+        if spans:
+            for s,e,m in spans:
+                sp=f"{s}-{e}" if s!=e else str(s)
+                print(f"  [{sp:>12}] {label}: {m:.4f}")
+        else: print("  None detected.")
+        print()
     print("--- Top 10 YoY Buyrate DROPS ---")
-    chg=[]
-    for idx in range(1,len(ys)):
-        y=ys[idx];yp=ys[idx-1]
-        br=ec[y].get("buyrate");brp=ec[yp].get("buyrate")
-        if br is not None and brp is not None and brp!=0:
-            chg.append((y,brp,br,((br-brp)/brp)*100))
-    chg.sort(key=lambda x:x[3])
-    for y,p,c,pct in chg[:10]:
+    br=df["buyrate"];brp=br.shift()
+    # 인접 연도 쌍 기준 (결측 연도를 건너뛰어 비교하지 않음), 동률은 연도 순서 유지
+    ok=br.notna()&brp.notna()&(brp!=0)
+    chg=pd.DataFrame({"p":brp[ok],"c":br[ok],"pct":((br[ok]-brp[ok])/brp[ok])*100})
+    chg=chg.sort_values("pct",kind="stable")
+    for y,(p,c,pct) in chg.head(10).iterrows():
         print(f"  {y}: {p:.4f} -> {c:.4f} ({pct:+.2f}%)")
     print()
     print("--- Top 10 YoY Buyrate RECOVERIES ---")
-    for y,p,c,pct in chg[-10:][::-1]:
+    for y,(p,c,pct) in chg.tail(10).iloc[::-1].iterrows():
         print(f"  {y}: {p:.4f} -> {c:.4f} ({pct:+.2f}%)")
     print()
     print("--- Gas Price Extremes ---")
-    gd=[(y,ec[y]["gas"]) for y in ys if "gas" in ec[y]]
-    if gd:
-        gs=sorted(gd,key=lambda x:x[1])
+    gs=df["gas"].dropna().sort_values(kind="stable")
+    if len(gs):
         print("  Lowest 5:")
-        for y,gv in gs[:5]: print(f"    {y}: {gv:.4f}")
+        for y,gv in gs.head(5).items(): print(f"    {y}: {gv:.4f}")
         print("  Highest 5:")
-        for y,gv in gs[-5:][::-1]: print(f"    {y}: {gv:.4f}")
+        for y,gv in gs.tail(5).iloc[::-1].items(): print(f"    {y}: {gv:.4f}")
     print()
     print("--- Known Historical Events vs Game Data ---")
     known=[
@@ -306,15 +300,15 @@ def main(xml_path: str | None = None):
         (2020,2021,"COVID-19 Pandemic"),
     ]
     for start,end,name in known:
-        brs=[ec[y].get("buyrate") for y in range(start,end+1) if y in ec and "buyrate" in ec[y]]
-        gases=[ec[y].get("gas") for y in range(start,end+1) if y in ec and "gas" in ec[y]]
-        if brs:
-            mb=min(brs)
+        win=df.loc[start:end]
+        brs=win["buyrate"].dropna();gases=win["gas"].dropna()
+        if len(brs):
+            mb=brs.min()
             if mb<0.80: lb="DEPRESSION"
             elif mb<0.90: lb="RECESSION"
             elif mb<0.95: lb="MILD"
             else: lb="STABLE"
-            gstr=f", gas peak {max(gases):.2f}" if gases else ""
+            gstr=f", gas peak {gases.max():.2f}" if len(gases) else ""
             print(f"  [{start}-{end}] {name:40s} low={mb:.4f} ({lb}){gstr}")
         elif start<=ys[-1]:
             print(f"  [{start}-{end}] {name:40s} (no data)")
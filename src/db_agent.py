@@ -8,19 +8,46 @@ Usage:
     poetry run python src/db_agent.py                     # 기본 테스트 쿼리 실행
     poetry run python src/db_agent.py --interactive       # 대화형 모드
     poetry run python src/db_agent.py --analyze pricing   # 판매 가격 분석
+    poetry run python src/db_agent.py --no-cache          # 질문/답변 캐시 비활성화
     poetry run python src/db_agent.py "D:\\path\\to\\save.db"
 """
 
+import argparse
+import asyncio
+import hashlib
 import os
+import pickle
+import re
 import sqlite3
 import sys
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import pandas as pd
+import numpy as np
 from dotenv import load_dotenv
-from langchain_community.utilities import SQLDatabase
-from langchain_community.agent_toolkits import create_sql_agent
-from langchain_ollama import ChatOllama
+
+from src.graph_utils import (
+    EMBED_MODEL,
+    LLM_NUM_CTX,
+    LLM_NUM_GPU,
+    OLLAMA_KEEP_ALIVE,
+    SCHEMA_MAP_PATH,
+    load_table_catalog,
+    get_ro_conn,
+    load_game_state,
+    load_player_state,
+    ollama_sync_client_kwargs,
+    ordering_terms,
+    strip_think_tags,
+    warm_up_llm,
+)
+
+# pandas / langchain_* 는 무거워서(수 초) 실제로 쓰는 함수 안에서 import 한다 → --help 등 CLI 시작이 즉시 끝남
+if TYPE_CHECKING:
+    from langchain_ollama import ChatOllama
 
 load_dotenv()
 
@@ -29,47 +56,30 @@ if not _db_env:
     raise EnvironmentError("GEARCITY_DB_PATH 환경변수가 설정되지 않았습니다. .env 파일을 확인하세요.")
 DEFAULT_DB_PATH = Path(_db_env)
 MODEL_NAME = os.getenv("OLLAMA_MODEL", "qwen3:30b")
+# Ollama 서버의 OLLAMA_NUM_PARALLEL과 맞춘다 (동시에 처리할 요청 슬롯 수)
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+CACHE_DIR = Path(__file__).resolve().parent.parent / "data" / "cache"
+QA_CACHE_PATH = CACHE_DIR / "qa_cache.db"
+# SQLDatabase.get_table_info에 붙는 샘플 행 수 (테이블 정보 캐시 키에도 포함)
+SAMPLE_ROWS_IN_TABLE_INFO = 3
+# 의미 캐시 임계값 (코사인 유사도): 이상이면 답변 재사용 / 이상이면 저장된 SQL만 재실행
+# SQL 재실행은 다른 질문의 SQL을 돌리는 것이라 거의 같은 문장일 때만 (0.85에선 최고/최저 질문이 서로 매칭됨)
+QA_CACHE_ANSWER_THRESHOLD = 0.95
+QA_CACHE_SQL_THRESHOLD = 0.97
 
 # ── 시스템 프롬프트 힌트 (개선점 1·2·3) ─────────────────────────
-AGENT_PREFIX = """\
-You are an agent designed to interact with a SQL database for the game GearCity.
-Given an input question, create a syntactically correct SQLite query, execute it,
-and return the answer.
-
-IMPORTANT RULES:
-- NEVER wrap your SQL in markdown code fences (```). Output raw SQL only.
-- When using sql_db_query or sql_db_query_checker, provide ONLY the SQL statement.
-- Unless the user specifies a row limit, always LIMIT to at most 20 results.
-
-KEY SCHEMA HINTS (read carefully):
-1. PlayerInfo and GameInfo are KEY-VALUE tables (not normal tables).
-   - PlayerInfo columns: Player_Varible (VARCHAR), Player_Data (VARCHAR)
-     Rows: Company_Name / Player_Name / Company_ID
-     → To get the player company ID: SELECT Player_Data FROM PlayerInfo WHERE Player_Varible = 'Company_ID'
-   - GameInfo columns: GameInfo_Varible (VARCHAR), GameInfo_Data (VARCHAR)
-     Rows include: Current_Year / Current_Turn / Starting_Year
-     → To get the current year: SELECT GameInfo_Data FROM GameInfo WHERE GameInfo_Varible = 'Current_Year'
-
-2. CompanyList is the master company table (301 rows).
-   - ID = company identifier, COMPANY_NAME = name, FUNDS_ONHAND = cash balance
-   - The player's company has ID = (value from PlayerInfo Company_ID)
-
-3. Factory & Production Lines:
-   - FactoryInfo: Factory_ID, Company_ID, City_ID, CarsInProduction, MaxCarsInProduction
-   - CarManufactor: actual production lines per factory.
-     Columns include: Factory_ID, Lines, Speed, Car_ID, Current_Employees, Unit_Cost
-     → Number of production lines in a factory = COUNT of rows in CarManufactor for that Factory_ID
-     → The 'Lines' column = number of assembly lines allocated to each car.
-
-4. Car & Sales:
-   - CarInfo: Car_ID, Company_ID, Name, Trim, CarType, sellprice, unitcost, sold_all_time, sold_this_month, sold_last_year, Rating_Overall
-   - CarDistro: per-city sales distribution. Company_ID, City_ID, Car_ID, Car_Name, SellPrice, Sold_This_Month, Possible_Sales
-   - MonthlyAutoBreakdown: monthly sales aggregates (CompanyID, CarID, Sales, Income, Year, Month)
-   - YearlyAutoBreakdown: yearly sales aggregates
-   - HistoricalReportPlayerSales: player's detailed sales history per turn/city
-
-5. Cities: CitiesInfo with City_ID, City_NAME, City_COUNTRY, City_POPULATION
-"""
+# 코드 펜스 금지 규칙 + PlayerInfo/GameInfo 키-값 구조 등 스키마 힌트.
+# 코드와 분리해 data/prompts/에 두고 import 시 한 번만 읽는다.
+AGENT_PREFIX_PATH = Path(__file__).resolve().parent.parent / "data" / "prompts" / "agent_prefix.txt"
+AGENT_PREFIX = AGENT_PREFIX_PATH.read_text(encoding="utf-8")
+
+# LLM이 규칙을 어기고 SQL을 ```sql ... ``` 로 감싸 보낸 경우 앞뒤 펜스만 떼어낸다
+_FENCE_RE = re.compile(r"^\s*```(?:sql)?\s*|\s*```\s*$", re.IGNORECASE)
+
+
+def strip_sql_fence(sql: str) -> str:
+    return _FENCE_RE.sub("", sql)
+
 
 # 테스트 질문 (영어로 해야 SQL 생성 정확도가 높음)
 TEST_QUERIES = [
@@ -99,40 +109,366 @@ TEST_QUERIES = [
 
 # ── SQL Agent (단순 질의용) ──────────────────────────────────────
 
-def create_agent(db_path: Path):
-    """DB와 LLM을 연결한 SQL Agent를 생성한다."""
-    if not db_path.exists():
-        raise FileNotFoundError(f"DB file not found: {db_path}")
+@lru_cache(maxsize=1)
+def build_agent_prefix() -> str:
+    """
+    AGENT_PREFIX + 테이블 카탈로그 (스키마 맵이 있으면).
+    질문과 무관하게 바이트 단위로 동일한 시스템 프롬프트를 만들어, Ollama가 이전 요청의
+    KV 캐시(prefix)를 재사용하고 질문 부분만 새로 prefill 하도록 한다.
+    """
+    if not SCHEMA_MAP_PATH.exists():
+        return AGENT_PREFIX
+    catalog = load_table_catalog(SCHEMA_MAP_PATH)
+    # 프롬프트 템플릿 변수로 해석되지 않도록 중괄호 이스케이프
+    catalog = catalog.replace("{", "{{").replace("}", "}}")
+    return f"{AGENT_PREFIX}\nTABLE CATALOG (name, rows, columns):\n{catalog}\n"
+
+
+def build_save_state_hint(db_path: Path) -> str:
+    """세이브 파일의 플레이어/게임 상태 값을 프롬프트에 리터럴로 넣을 블록.
+
+    LLM이 매 SQL마다 PlayerInfo/GameInfo 키-값 서브쿼리를 쓰지 않아도 되게 한다.
+    턴마다 바뀌는 값이라 build_agent_prefix() 뒤에 붙여 고정 prefix는 그대로 둔다.
+    """
+    conn = get_ro_conn(db_path)
+    try:
+        player = load_player_state(conn)
+        game = load_game_state(conn)
+    except sqlite3.Error:
+        return ""
+
+    lines = [f"- PlayerInfo.{k} = {v}" for k, v in player.items()]
+    lines += [f"- GameInfo.{k} = {v}" for k, v in game.items()]
+    if not lines:
+        return ""
+    text = "\n".join(lines).replace("{", "{{").replace("}", "}}")
+    return (
+        "\nCURRENT SAVE STATE (use these values as literals instead of "
+        f"PlayerInfo/GameInfo subqueries):\n{text}\n"
+    )
 
+
+@lru_cache(maxsize=1)
+def _unfenced_toolkit_cls():
+    """sql_db_query 도구가 실행 전에 코드 펜스를 제거하는 SQLDatabaseToolkit 서브클래스.
+
+    베이스 클래스가 langchain_community에 있으므로 처음 필요할 때 한 번만 정의한다.
+    """
+    from langchain_community.agent_toolkits import SQLDatabaseToolkit
+    from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool
+
+    class UnfencedQueryTool(QuerySQLDatabaseTool):
+        # 펜스 때문에 생기는 문법 오류 → 재시도 턴 낭비 방지
+        def _run(self, query: str, run_manager=None):
+            return super()._run(strip_sql_fence(query), run_manager)
+
+    class UnfencedSQLToolkit(SQLDatabaseToolkit):
+        def get_tools(self):
+            return [
+                UnfencedQueryTool(db=t.db, description=t.description)
+                if isinstance(t, QuerySQLDatabaseTool) else t
+                for t in super().get_tools()
+            ]
+
+    return UnfencedSQLToolkit
+
+
+def load_or_build_table_info(db_path: Path) -> dict[str, str]:
+    """테이블별 get_table_info 문자열(CREATE TABLE + 샘플 행)을 DB mtime 기준으로 캐시한다.
+
+    캐시가 유효하면 SQLAlchemy 리플렉션과 테이블별 샘플 행 SELECT를 건너뛴다.
+    세이브 파일이 바뀌면(mtime 변경) 다시 만든다.
+    """
+    db_path = db_path.resolve()
+    mtime = db_path.stat().st_mtime
+    cache_file = CACHE_DIR / f"{db_path.stem}.tableinfo.pkl"
+    key = (str(db_path), mtime, SAMPLE_ROWS_IN_TABLE_INFO)
+
+    try:
+        with open(cache_file, "rb") as f:
+            cached_key, info = pickle.load(f)
+        if cached_key == key:
+            return info
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        pass
+
+    from langchain_community.utilities import SQLDatabase
+
+    db = SQLDatabase.from_uri(f"sqlite:///{db_path}", sample_rows_in_table_info=SAMPLE_ROWS_IN_TABLE_INFO)
+    info = {t: db.get_table_info([t]) for t in db.get_usable_table_names()}
+
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_file, "wb") as f:
+        pickle.dump((key, info), f, protocol=pickle.HIGHEST_PROTOCOL)
+    return info
+
+
+@lru_cache(maxsize=4)
+def _create_agent_cached(db_path: Path, db_mtime: float):
+    from langchain_community.agent_toolkits import create_sql_agent
+    from langchain_community.utilities import SQLDatabase
+    from langchain_ollama import ChatOllama
+
+    # 캐시된 테이블 정보를 custom_table_info로 넘기고 리플렉션은 필요할 때만 (시작 시 PRAGMA/샘플 조회 생략)
     db = SQLDatabase.from_uri(
         f"sqlite:///{db_path}",
-        sample_rows_in_table_info=3,
+        sample_rows_in_table_info=SAMPLE_ROWS_IN_TABLE_INFO,
+        lazy_table_reflection=True,
+        custom_table_info=load_or_build_table_info(db_path),
     )
 
-    llm = ChatOllama(model=MODEL_NAME, temperature=0)
+    llm = ChatOllama(
+        model=MODEL_NAME,
+        temperature=0,
+        num_ctx=LLM_NUM_CTX,          # num_ctx가 바뀌면 Ollama가 모델을 다시 로드하므로 고정
+        num_gpu=LLM_NUM_GPU,          # 그래프 쪽 create_llm과 같은 값 (다르면 재로딩)
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        sync_client_kwargs=ollama_sync_client_kwargs(),
+    )
 
     agent = create_sql_agent(
         llm=llm,
-        db=db,
-        prefix=AGENT_PREFIX,
+        toolkit=_unfenced_toolkit_cls()(db=db, llm=llm),
+        prefix=build_agent_prefix() + build_save_state_hint(db_path),
         verbose=True,
-        agent_executor_kwargs={"handle_parsing_errors": True},
+        agent_executor_kwargs={
+            "handle_parsing_errors": True,
+            "return_intermediate_steps": True,  # 캐시에 저장할 최종 SQL 추출용
+        },
     )
 
     return agent, db, llm
 
 
-def run_test_queries(agent):
-    """사전 정의된 테스트 질문을 실행한다."""
-    for t in TEST_QUERIES:
+def create_agent(db_path: Path):
+    """DB와 LLM을 연결한 SQL Agent를 생성한다. 같은 DB(경로+mtime)면 이전 Agent를 재사용."""
+    if not db_path.exists():
+        raise FileNotFoundError(f"DB file not found: {db_path}")
+
+    return _create_agent_cached(db_path, db_path.stat().st_mtime)
+
+
+# ── 질문 → 답변 캐시 ────────────────────────────────────────────
+
+QA_CACHE_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS qa_cache (
+    sig       TEXT PRIMARY KEY,  -- 정규화한 질문의 해시 (정확 일치 키)
+    tables    TEXT,              -- 질문에 언급된 테이블 (정렬, 쉼표 구분)
+    embedding BLOB,              -- float32 정규화 임베딩 (없으면 NULL)
+    question  TEXT,
+    sql       TEXT,              -- Agent가 마지막으로 실행한 SQL
+    answer    TEXT,
+    db_mtime  REAL,
+    ts        REAL
+)
+"""
+
+_RE_SPACES = re.compile(r"\s+")
+_RE_WORDS = re.compile(r"\w+")
+# 연도/개수 등 숫자만 다른 질문("1930년 매출" vs "1931년 매출")은 유사도가 높아도 의미 캐시로 매칭하지 않는다
+_RE_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+# 저장된 SQL을 현재 세이브에 재실행한 결과를 답변 문장으로 정리 (Agent의 다단계 추론 없이 LLM 1회)
+RERUN_PROMPT = """\
+You are a GearCity business analyst AI.
+The user asked: "{question}"
+
+This SQL was run on the current save to answer it:
+{sql}
+
+Result rows:
+{result}
+
+Answer the question from the result rows. Be concise.
+Answer in the same language as the user's question."""
+
+
+def normalize_question(question: str) -> str:
+    return _RE_SPACES.sub(" ", question).strip().lower().rstrip("?.! ")
+
+
+class CachedAgent:
+    """
+    SQL Agent 앞단의 2단계 캐시.
+      1) 정확 일치: 정규화한 질문 해시가 같고 DB가 그대로면 저장된 답변을 반환
+      2) 의미 유사: 임베딩 코사인 유사도가
+         >= QA_CACHE_ANSWER_THRESHOLD 이고 DB가 그대로면 답변 재사용,
+         >= QA_CACHE_SQL_THRESHOLD 이면 저장된 SQL만 현재 DB에 재실행하고
+         그 결과를 LLM이 답변으로 정리 (RERUN_PROMPT)
+    언급된 테이블 집합, 질문 속 숫자, 최상급/정렬/부정 표현(ordering_terms)이 다른 질문끼리는
+    의미 캐시로 매칭하지 않는다.
+    """
+
+    def __init__(self, agent, db, llm: "ChatOllama", db_path: Path, cache_path: Path = QA_CACHE_PATH):
+        from langchain_ollama import OllamaEmbeddings
+
+        self.agent = agent
+        self.db = db
+        self.llm = llm
+        self.db_path = db_path
+        self._table_names = {t.lower(): t for t in db.get_usable_table_names()}
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # ainvoke는 조회/저장을 워커 스레드에서 하므로 연결을 스레드 간 공유하고 락으로 직렬화
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(QA_CACHE_SCHEMA)
+        self._embedder = OllamaEmbeddings(
+            model=EMBED_MODEL, sync_client_kwargs=ollama_sync_client_kwargs()
+        )
+        self._load_index()
+
+    def _load_index(self):
+        """임베딩 전체를 (N, dim) 행렬로 올려 두고 유사도는 행렬곱 한 번으로 계산."""
+        rows = self._conn.execute(
+            "SELECT sig, tables, question, embedding FROM qa_cache WHERE embedding IS NOT NULL"
+        ).fetchall()
+        self._sigs = [r[0] for r in rows]
+        self._sig_tables = [r[1] for r in rows]
+        self._sig_numbers = [_RE_NUMBER.findall(normalize_question(r[2] or "")) for r in rows]
+        self._sig_terms = [ordering_terms(normalize_question(r[2] or "")) for r in rows]
+        self._matrix = (
+            np.vstack([np.frombuffer(r[3], dtype=np.float32) for r in rows])
+            if rows else None
+        )
+
+    def _tables_in(self, question: str) -> str:
+        words = {w.lower() for w in _RE_WORDS.findall(question)}
+        return ",".join(sorted(self._table_names[w] for w in words if w in self._table_names))
+
+    def _embed(self, text: str):
+        """임베딩 모델을 쓸 수 없으면 None (정확 일치 캐시만 동작)."""
+        if self._embedder is None:
+            return None
+        try:
+            vec = np.asarray(self._embedder.embed_query(text), dtype=np.float32)
+        except Exception as e:
+            print(f"[QA Cache] Embedding disabled ({EMBED_MODEL}): {e}")
+            self._embedder = None
+            return None
+        return vec / (np.linalg.norm(vec) or 1.0)
+
+    def _row(self, sig: str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT sql, answer, db_mtime FROM qa_cache WHERE sig = ?", (sig,)
+            ).fetchone()
+
+    def _rerun(self, question: str, sql: str) -> dict:
+        """저장된 SQL을 현재 세이브에 실행하고, 결과 행을 LLM이 질문에 대한 답변으로 정리한다."""
+        prompt = RERUN_PROMPT.format(question=question, sql=sql, result=self.db.run(sql))
+        return {"output": strip_think_tags(self.llm.invoke(prompt).content)}
+
+    def _lookup(self, question: str):
+        """캐시 조회. (응답 또는 None, 미스 시 저장에 쓸 키 정보)를 반환한다."""
+        norm = normalize_question(question)
+        sig = hashlib.sha1(norm.encode("utf-8")).hexdigest()
+        tables = self._tables_in(norm)
+        numbers = _RE_NUMBER.findall(norm)
+        terms = ordering_terms(norm)
+        db_mtime = self.db_path.stat().st_mtime
+
+        # 1) 정확 일치
+        hit = self._row(sig)
+        if hit:
+            sql, answer, cached_mtime = hit
+            if cached_mtime == db_mtime:
+                print("[QA Cache] exact hit")
+                return {"output": answer}, None
+            if sql:
+                print("[QA Cache] exact hit, save changed -> re-running SQL")
+                return self._rerun(question, sql), None
+
+        # 2) 의미 유사
+        vec = self._embed(norm)
+        if vec is not None and self._matrix is not None:
+            scores = self._matrix @ vec
+            for i in np.argsort(scores)[::-1][:5]:
+                score = float(scores[i])
+                if score < min(QA_CACHE_ANSWER_THRESHOLD, QA_CACHE_SQL_THRESHOLD):
+                    break
+                # 테이블/숫자/최상급·정렬·부정 표현 중 하나라도 다르면 다른 질문 ("최고 마진" vs "최저 마진")
+                if (
+                    self._sig_tables[i] != tables
+                    or self._sig_numbers[i] != numbers
+                    or self._sig_terms[i] != terms
+                ):
+                    continue
+                sql, answer, cached_mtime = self._row(self._sigs[i])
+                if score >= QA_CACHE_ANSWER_THRESHOLD and cached_mtime == db_mtime:
+                    print(f"[QA Cache] semantic hit ({score:.3f})")
+                    return {"output": answer}, None
+                if sql and score >= QA_CACHE_SQL_THRESHOLD:
+                    print(f"[QA Cache] similar question ({score:.3f}) -> re-running SQL")
+                    return self._rerun(question, sql), None
+                break
+
+        return None, (sig, tables, vec, db_mtime)
+
+    def _store(self, question: str, key, response: dict):
+        sig, tables, vec, db_mtime = key
+        sql = next(
+            (
+                strip_sql_fence(action.tool_input)
+                for action, _ in reversed(response.get("intermediate_steps", []))
+                if action.tool == "sql_db_query" and isinstance(action.tool_input, str)
+            ),
+            None,
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO qa_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sig, tables, vec.tobytes() if vec is not None else None,
+                 question, sql, response["output"], db_mtime, time.time()),
+            )
+            self._conn.commit()
+            if vec is not None:
+                self._sigs.append(sig)
+                self._sig_tables.append(tables)
+                self._sig_numbers.append(_RE_NUMBER.findall(normalize_question(question)))
+                self._sig_terms.append(ordering_terms(normalize_question(question)))
+                self._matrix = vec[None, :] if self._matrix is None else np.vstack([self._matrix, vec])
+
+    def invoke(self, question: str) -> dict:
+        cached, key = self._lookup(question)
+        if cached is not None:
+            return cached
+        # 3) 미스: Agent 실행 후 저장
+        response = self.agent.invoke(question)
+        self._store(question, key, response)
+        return response
+
+    async def ainvoke(self, question: str) -> dict:
+        # 조회(임베딩 요청/SQL 재실행)와 저장(SQLite commit)은 동기 I/O — 이벤트 루프를 막지 않게 스레드에서
+        cached, key = await asyncio.to_thread(self._lookup, question)
+        if cached is not None:
+            return cached
+        response = await self.agent.ainvoke(question)
+        await asyncio.to_thread(self._store, question, key, response)
+        return response
+
+
+async def run_test_queries(agent, concurrency: int = OLLAMA_NUM_PARALLEL):
+    """
+    사전 정의된 테스트 질문을 동시에 실행한다 (ainvoke + gather).
+    Ollama 서버의 OLLAMA_NUM_PARALLEL 슬롯 수만큼만 동시에 보내 VRAM 포화를 막는다.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def ask(query: str):
+        async with sem:
+            return await agent.ainvoke(query)
+
+    results = await asyncio.gather(
+        *(ask(t["query"]) for t in TEST_QUERIES), return_exceptions=True
+    )
+    for t, response in zip(TEST_QUERIES, results):
         print(f"\n{'='*60}")
         print(f">>> {t['label']}")
         print(f"{'='*60}")
-        try:
-            response = agent.invoke(t["query"])
+        if isinstance(response, Exception):
+            print(f"\nError: {response}")
+        else:
             print(f"\nAnswer: {response['output']}")
-        except Exception as e:
-            print(f"\nError: {e}")
 
 
 def run_interactive(agent):
@@ -155,7 +491,18 @@ def run_interactive(agent):
 
 # ── 하이브리드 분석 (SQL 직접 실행 → LLM 해석) ──────────────────
 
+# 플레이어 회사 ID(:cid)는 load_player_state()로 한 번 읽어서 바인딩 — 스칼라 서브쿼리를 두 번 넣지 않는다
 PRICING_SQL = """\
+WITH distro AS (
+    SELECT Car_ID,
+           SellPrice,
+           SUM(Sold_This_Month)    AS total_sold_month,
+           SUM(Possible_Sales)     AS total_possible,
+           COUNT(DISTINCT City_ID) AS city_count
+    FROM CarDistro
+    WHERE Company_ID = :cid
+    GROUP BY Car_ID
+)
 SELECT
     ci.Name,
     ci.Trim,
@@ -173,21 +520,49 @@ SELECT
     distro.total_possible    AS distro_possible_sales,
     distro.city_count        AS cities_selling
 FROM CarInfo ci
-JOIN (
-    SELECT Car_ID,
-           SellPrice,
-           SUM(Sold_This_Month)    AS total_sold_month,
-           SUM(Possible_Sales)     AS total_possible,
-           COUNT(DISTINCT City_ID) AS city_count
-    FROM CarDistro
-    WHERE Company_ID = (SELECT Player_Data FROM PlayerInfo WHERE Player_Varible = 'Company_ID')
-    GROUP BY Car_ID
-) distro ON ci.Car_ID = distro.Car_ID
-WHERE ci.Company_ID = (SELECT Player_Data FROM PlayerInfo WHERE Player_Varible = 'Company_ID')
+JOIN distro ON ci.Car_ID = distro.Car_ID
+WHERE ci.Company_ID = :cid
   AND ci.Status >= 0
 ORDER BY margin_pct DESC;
 """
 
+# 가격 분석 응답 최대 토큰 (프롬프트의 "500단어 이하"에 여유를 둔 상한)
+PRICING_MAX_TOKENS = 700
+
+# 마진 구간 (PRICING_PROMPT의 기준과 동일)
+MARGIN_HEALTHY = 0.30
+MARGIN_LOW = 0.20
+MARGIN_BANDS = np.array(["healthy", "ok", "low"])
+
+
+def _classify_pricing(sell, cost, sold, possible):
+    margin = (sell - cost) / np.where(sell > 0, sell, np.nan)
+    bands = np.where(margin >= MARGIN_HEALTHY, 0, np.where(margin >= MARGIN_LOW, 1, 2))
+    demand = sold / np.maximum(possible, 1.0)
+    return bands, demand
+
+
+@lru_cache(maxsize=1)
+def _pricing_kernel():
+    """numba가 있으면 _classify_pricing을 JIT 컴파일 (없으면 같은 코드를 NumPy로 그대로 실행).
+
+    numba import도 무거우므로 가격 분석을 실제로 할 때 한 번만 시도한다.
+    """
+    try:
+        from numba import njit
+    except ImportError:
+        return _classify_pricing
+    return njit(cache=True)(_classify_pricing)
+
+
+def classify_pricing(sell, cost, sold, possible):
+    """차종별 마진 구간(0=healthy, 1=ok, 2=low)과 수요 충족률(sold/possible)을 계산한다.
+
+    판매가가 0 이하인 차는 마진을 계산할 수 없으므로 low로 분류한다.
+    """
+    return _pricing_kernel()(sell, cost, sold, possible)
+
+
 PRICING_PROMPT = """\
 You are a GearCity business analyst AI. Analyze the following pricing data for the player's car lineup.
 
@@ -200,9 +575,9 @@ Current game year: {game_year}
 Provide a concise pricing analysis in English, covering:
 
 1. **Overview**: How many cars, average margin, overall health of the lineup
-2. **Healthy margins** (>= 30%): Which cars are well-priced
-3. **Low margin warnings** (< 20%): Which cars need price increases or cost reduction
-4. **Demand signals**: Compare distro_sold_month vs distro_possible_sales
+2. **Healthy margins** (>= 30%, margin_band = healthy): Which cars are well-priced
+3. **Low margin warnings** (< 20%, margin_band = low): Which cars need price increases or cost reduction
+4. **Demand signals**: Compare distro_sold_month vs distro_possible_sales (demand_ratio = sold / possible)
    - If possible_sales > 0 and sold is near possible: demand is met, consider raising price
    - If sold_this_month = 0 despite being sold in multiple cities: possibly overpriced or outdated
    - If sold_all_time is very high but sold_this_month is low: aging product, may need refresh
@@ -212,24 +587,32 @@ Keep the response under 500 words. Use bullet points.
 """
 
 
-def analyze_pricing(db_path: Path, llm: ChatOllama):
+def analyze_pricing(db_path: Path, llm: "ChatOllama"):
     """판매 가격 적절성을 분석한다: SQL 직접 실행 → LLM 해석."""
-    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
-    try:
-        # 게임 연도 조회
-        game_year = conn.execute(
-            "SELECT GameInfo_Data FROM GameInfo WHERE GameInfo_Varible = 'Current_Year'"
-        ).fetchone()[0]
+    import pandas as pd
+
+    conn = get_ro_conn(db_path)
+    # 키-값 테이블은 한 번씩만 읽어서 게임 연도·회사 ID를 꺼낸다
+    game_year = load_game_state(conn)["Current_Year"]
+    company_id = load_player_state(conn)["Company_ID"]
 
-        # 가격 데이터 조회
-        df = pd.read_sql_query(PRICING_SQL, conn)
-    finally:
-        conn.close()
+    # 가격 데이터 조회
+    df = pd.read_sql_query(PRICING_SQL, conn, params={"cid": company_id})
 
     if df.empty:
         print("No active cars found for the player company.")
         return
 
+    # 마진 구간·수요 충족률은 LLM에 맡기지 않고 미리 계산해서 표에 붙인다
+    bands, demand = classify_pricing(
+        df["sell_price"].to_numpy(np.float64, na_value=0),
+        df["unit_cost"].to_numpy(np.float64, na_value=0),
+        df["distro_sold_month"].to_numpy(np.float64, na_value=0),
+        df["distro_possible_sales"].to_numpy(np.float64, na_value=0),
+    )
+    df["margin_band"] = MARGIN_BANDS[bands]
+    df["demand_ratio"] = demand.round(2)
+
     # 결과 테이블 출력
     print(f"\n{'='*60}")
     print(f"  Pricing Analysis (Game Year: {game_year})")
@@ -243,48 +626,73 @@ def analyze_pricing(db_path: Path, llm: ChatOllama):
         pricing_table=df.to_markdown(index=False),
     )
 
-    response = llm.invoke(prompt)
-    # Windows cp949 인코딩 문제 방지
-    text = response.content
-    sys.stdout.buffer.write(text.encode("utf-8", errors="replace"))
-    sys.stdout.buffer.write(b"\n")
-    sys.stdout.buffer.flush()
+    # 토큰이 생성되는 대로 출력 (전체 응답을 기다리지 않음). num_ctx는 그대로 두고
+    # 출력 길이만 제한 → 모델 재로딩 없이 "500단어 이하" 응답의 디코딩 상한을 건다
+    capped = llm.model_copy(update={"num_predict": PRICING_MAX_TOKENS})
+    out = sys.stdout.buffer
+    for chunk in capped.stream(prompt):
+        # Windows cp949 인코딩 문제 방지
+        out.write(chunk.content.encode("utf-8", errors="replace"))
+        out.flush()
+    out.write(b"\n")
+    out.flush()
 
 
 # ── CLI ──────────────────────────────────────────────────────────
 
+# --analyze 대상 → 분석 함수 (db_path, llm)
+ANALYZE_TARGETS = {
+    "pricing": analyze_pricing,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="GearCity DB Agent (Text-to-SQL)")
+    parser.add_argument(
+        "db", nargs="?", type=Path, default=DEFAULT_DB_PATH,
+        help=f"세이브 파일(.db) 경로 (default: {DEFAULT_DB_PATH})",
+    )
+    parser.add_argument(
+        "--interactive", action="store_true",
+        help="대화형 모드",
+    )
+    parser.add_argument(
+        "--analyze", choices=sorted(ANALYZE_TARGETS),
+        help="SQL 직접 실행 + LLM 해석 분석",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="질문/답변 캐시 비활성화",
+    )
+    return parser.parse_args()
+
+
 def main():
-    db_path = DEFAULT_DB_PATH
-    interactive = False
-    analyze_target = None
-
-    args = sys.argv[1:]
-    i = 0
-    while i < len(args):
-        if args[i] == "--interactive":
-            interactive = True
-        elif args[i] == "--analyze" and i + 1 < len(args):
-            analyze_target = args[i + 1]
-            i += 1
-        elif not args[i].startswith("-"):
-            db_path = Path(args[i])
-        i += 1
+    args = parse_args()
+    db_path = args.db
 
     print(f"DB: {db_path}")
     print(f"Model: {MODEL_NAME}")
     print("Connecting...")
+    # 에이전트/DB 준비와 겹쳐서 모델 로드
+    warm_up_llm()
 
     agent, db, llm = create_agent(db_path)
 
     table_count = len(db.get_usable_table_names())
     print(f"Connected! {table_count} tables available.\n")
 
-    if analyze_target == "pricing":
-        analyze_pricing(db_path, llm)
-    elif interactive:
+    if args.analyze:
+        # 분석 모드는 Agent를 쓰지 않으므로 QA 캐시(임베딩 모델 연결/인덱스 로드)도 만들지 않는다
+        ANALYZE_TARGETS[args.analyze](db_path, llm)
+        return
+
+    if not args.no_cache:
+        agent = CachedAgent(agent, db, llm, db_path)
+    if args.interactive:
         run_interactive(agent)
     else:
-        run_test_queries(agent)
+        asyncio.run(run_test_queries(agent))
 
 
 if __name__ == "__main__":
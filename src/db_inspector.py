@@ -6,7 +6,7 @@ GearCity DB Inspector (LLM System Prompt Generator)
 
 기존 inspect_db.py와의 차이:
   - LLM 시스템 프롬프트에 바로 주입 가능한 포맷
-  - pandas to_markdown으로 깔끔한 샘플 테이블
+  - 샘플 데이터를 Markdown 테이블로 정리 (pandas 없이 직접 출력)
   - FK 관계, row count 포함
 
 Usage:
@@ -19,10 +19,12 @@ import os
 import sqlite3
 import sys
 from pathlib import Path
+from typing import TextIO
 
-import pandas as pd
 from dotenv import load_dotenv
 
+from src.graph_utils import get_ro_conn, md_table, write_table_catalog
+
 load_dotenv()
 
 _db_env = os.getenv("GEARCITY_DB_PATH")
@@ -31,6 +33,9 @@ if not _db_env:
 DEFAULT_DB_PATH = Path(_db_env)
 DEFAULT_OUTPUT = Path(__file__).resolve().parent.parent / "data" / "schema" / "db_schema_map.txt"
 SAMPLE_ROWS = 3
+MAX_CELL_LEN = 80       # 샘플 데이터 셀 최대 길이 (넘으면 잘라서 "..." 추가)
+COUNT_BATCH = 400       # row count UNION ALL 한 쿼리에 묶을 테이블 수
+EXACT_COUNT_BELOW = 1000  # 추정 행 수가 이보다 작은 테이블만 COUNT(*)로 정확히 센다
 
 
 def find_db_file(path_arg: str | None) -> Path:
@@ -56,48 +61,142 @@ def get_tables(cursor: sqlite3.Cursor) -> list[str]:
     return [row[0] for row in cursor.fetchall()]
 
 
-def get_columns(cursor: sqlite3.Cursor, table: str) -> list[dict]:
-    cursor.execute(f"PRAGMA table_info('{table}');")
-    return [
-        {"name": r[1], "type": r[2], "pk": bool(r[5]), "notnull": bool(r[3])}
-        for r in cursor.fetchall()
-    ]
-
-
-def get_foreign_keys(cursor: sqlite3.Cursor, table: str) -> list[dict]:
-    cursor.execute(f"PRAGMA foreign_key_list('{table}');")
-    return [
-        {"from": r[3], "to_table": r[2], "to_column": r[4]}
-        for r in cursor.fetchall()
-    ]
-
-
-def get_row_count(cursor: sqlite3.Cursor, table: str) -> int:
-    cursor.execute(f"SELECT COUNT(*) FROM '{table}';")
-    return cursor.fetchone()[0]
+def _quote(name: str) -> str:
+    """SQLite 식별자 인용 (테이블명에 공백/따옴표가 있어도 안전하게)."""
+    return '"' + name.replace('"', '""') + '"'
 
 
-def build_schema_doc(db_path: Path, cursor: sqlite3.Cursor, conn: sqlite3.Connection) -> str:
-    """LLM 시스템 프롬프트용 스키마 문서를 생성한다."""
+def get_all_columns(cursor: sqlite3.Cursor) -> dict[str, list[dict]]:
+    """전체 테이블의 컬럼 정보를 테이블값 PRAGMA 한 번의 쿼리로 가져온다. {테이블: [컬럼...]}"""
+    cursor.execute(
+        "SELECT m.name, p.name, p.type, p.\"notnull\", p.pk "
+        "FROM sqlite_master m JOIN pragma_table_info(m.name) p "
+        "WHERE m.type='table' ORDER BY m.name, p.cid;"
+    )
+    columns: dict[str, list[dict]] = {}
+    for table, name, col_type, notnull, pk in cursor.fetchall():
+        columns.setdefault(table, []).append(
+            {"name": name, "type": col_type, "pk": bool(pk), "notnull": bool(notnull)}
+        )
+    return columns
+
+
+def get_all_foreign_keys(cursor: sqlite3.Cursor) -> dict[str, list[dict]]:
+    """전체 테이블의 FK 정보를 테이블값 PRAGMA 한 번의 쿼리로 가져온다. {테이블: [FK...]}"""
+    cursor.execute(
+        "SELECT m.name, f.\"from\", f.\"table\", f.\"to\" "
+        "FROM sqlite_master m JOIN pragma_foreign_key_list(m.name) f "
+        "WHERE m.type='table' ORDER BY m.name, f.id, f.seq;"
+    )
+    fks: dict[str, list[dict]] = {}
+    for table, col_from, to_table, to_column in cursor.fetchall():
+        fks.setdefault(table, []).append(
+            {"from": col_from, "to_table": to_table, "to_column": to_column}
+        )
+    return fks
+
+
+def _batched_scalars(cursor: sqlite3.Cursor, tables: list[str], expr: str) -> dict[str, int]:
+    """테이블마다 SELECT ?, {expr} FROM t 를 UNION ALL로 묶어 실행한다. {테이블: 값}
+
+    SQLite의 compound SELECT 항 수 제한(기본 500)을 넘지 않도록 COUNT_BATCH개씩 나눈다.
+    """
+    values: dict[str, int] = {}
+    for i in range(0, len(tables), COUNT_BATCH):
+        batch = tables[i:i + COUNT_BATCH]
+        sql = " UNION ALL ".join(f"SELECT ?, {expr} FROM {_quote(t)}" for t in batch)
+        cursor.execute(sql, batch)
+        values.update(cursor.fetchall())
+    return values
+
+
+def _stat1_estimates(cursor: sqlite3.Cursor) -> dict[str, int]:
+    """sqlite_stat1(ANALYZE 결과)가 있으면 각 stat의 첫 숫자(테이블 행 수)를 읽는다."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+    if cursor.fetchone() is None:
+        return {}
+    cursor.execute("SELECT tbl, stat FROM sqlite_stat1")
+    estimates: dict[str, int] = {}
+    for tbl, stat in cursor.fetchall():
+        head = (stat or "").split(" ", 1)[0]
+        if head.isdigit():
+            estimates.setdefault(tbl, int(head))
+    return estimates
+
+
+def _rowid_tables(cursor: sqlite3.Cursor) -> set[str]:
+    """MAX(_rowid_)를 쓸 수 있는 일반 rowid 테이블 (WITHOUT ROWID/가상 테이블 제외)."""
+    try:
+        cursor.execute(
+            "SELECT name FROM pragma_table_list WHERE schema = 'main' AND type = 'table' AND wr = 0"
+        )
+    except sqlite3.OperationalError:  # SQLite < 3.37: 판별 불가 → 전부 정확히 센다
+        return set()
+    return {row[0] for row in cursor.fetchall()}
+
+
+def get_row_counts(cursor: sqlite3.Cursor, tables: list[str]) -> tuple[dict[str, int], set[str]]:
+    """전체 테이블의 (row count, 추정치를 쓴 테이블 집합). 큰 테이블은 전체 스캔 없이 추정치를 쓴다.
+
+    sqlite_stat1 추정치 → MAX(_rowid_) 순으로 어림하고, 추정이 없거나 EXACT_COUNT_BELOW
+    미만인 테이블만 COUNT(*)로 정확히 센다. (세이브는 read-only라 ANALYZE는 실행하지 않음)
+    MAX(_rowid_)는 삭제된 행만큼 실제보다 클 수 있다.
+    """
+    estimates = _stat1_estimates(cursor)
+    rowid_tables = _rowid_tables(cursor)
+    estimates.update(_batched_scalars(
+        cursor, [t for t in tables if t not in estimates and t in rowid_tables], "MAX(_rowid_)"
+    ))
+
+    counts = {t: estimates[t] for t in tables if (estimates.get(t) or 0) >= EXACT_COUNT_BELOW}
+    estimated = set(counts)
+    counts.update(_batched_scalars(cursor, [t for t in tables if t not in counts], "COUNT(*)"))
+    return counts, estimated
+
+
+def sample_query(table: str, columns: list[dict], limit: int = SAMPLE_ROWS) -> str:
+    """샘플 행 SELECT. 긴 TEXT 값은 SQLite 안에서 MAX_CELL_LEN자로 잘라 '...'를 붙인다.
+
+    typeof()='text'인 값만 자르므로 숫자/BLOB 값은 원래 타입 그대로 나온다.
+    """
+    if not columns:
+        return f"SELECT * FROM {_quote(table)} LIMIT {limit}"
+    exprs = []
+    for c in columns:
+        q = _quote(c["name"])
+        exprs.append(
+            f"CASE WHEN typeof({q}) = 'text' AND length({q}) > {MAX_CELL_LEN} "
+            f"THEN substr({q}, 1, {MAX_CELL_LEN}) || '...' ELSE {q} END AS {q}"
+        )
+    return f"SELECT {', '.join(exprs)} FROM {_quote(table)} LIMIT {limit}"
+
+
+def write_schema_doc(db_path: Path, cursor: sqlite3.Cursor, conn: sqlite3.Connection, fh: TextIO) -> int:
+    """LLM 시스템 프롬프트용 스키마 문서를 fh에 테이블 단위로 바로 쓴다. 테이블 수를 반환."""
     tables = get_tables(cursor)
-
-    lines = [
-        "# GearCity Database Schema Map",
-        "",
-        f"Source: {db_path.name}",
-        f"Tables: {len(tables)}",
-        "Use this document to construct valid SQL queries against the save file.",
-        "",
-    ]
+    # 메타데이터는 테이블마다 조회하지 않고 한 번에 가져온다
+    all_columns = get_all_columns(cursor)
+    all_fks = get_all_foreign_keys(cursor)
+    row_counts, estimated = get_row_counts(cursor, tables)
+
+    fh.write(
+        "# GearCity Database Schema Map\n"
+        "\n"
+        f"Source: {db_path.name}\n"
+        f"Tables: {len(tables)}\n"
+        "Use this document to construct valid SQL queries against the save file.\n"
+        "Row counts marked with ~ are estimates.\n"
+    )
 
     for table in tables:
-        columns = get_columns(cursor, table)
-        fks = get_foreign_keys(cursor, table)
-        row_count = get_row_count(cursor, table)
+        columns = all_columns.get(table, [])
+        fks = all_fks.get(table, [])
+        row_count = row_counts[table]
         fk_map = {fk["from"]: f"-> {fk['to_table']}.{fk['to_column']}" for fk in fks}
 
-        lines.append(f"## Table: {table} ({row_count} rows)")
-        lines.append("")
+        # 추정치는 카탈로그에도 그대로 옮겨지도록 숫자 앞에 ~를 붙인다
+        approx = "~" if table in estimated else ""
+        fh.write(f"\n## Table: {table} ({approx}{row_count} rows)\n\n")
 
         # 컬럼 정보 한 줄 요약
         col_parts = []
@@ -108,34 +207,25 @@ def build_schema_doc(db_path: Path, cursor: sqlite3.Cursor, conn: sqlite3.Connec
             if fk_map.get(c["name"]):
                 desc += f" {fk_map[c['name']]}"
             col_parts.append(desc)
-        lines.append("- Columns: " + ", ".join(col_parts))
-        lines.append("")
+        fh.write("- Columns: " + ", ".join(col_parts) + "\n\n")
 
-        # 샘플 데이터 (pandas to_markdown)
+        # 샘플 데이터 (Markdown 테이블)
         if row_count > 0:
             try:
-                df = pd.read_sql_query(
-                    f"SELECT * FROM '{table}' LIMIT {SAMPLE_ROWS}", conn
-                )
-                # 긴 값 잘라내기
-                for col in df.columns:
-                    df[col] = df[col].apply(
-                        lambda v: str(v)[:80] + "..." if isinstance(v, str) and len(str(v)) > 80 else v
-                    )
-                lines.append("- Sample Data:")
-                lines.append(df.to_markdown(index=False))
-                lines.append("")
+                cursor.execute(sample_query(table, columns))
+                rows = cursor.fetchall()
+                cols = [d[0] for d in cursor.description]
+                fh.write("- Sample Data:\n")
+                md_table(cols, rows, fh)
+                fh.write("\n")
             except Exception as e:
-                lines.append(f"- Error reading data: {e}")
-                lines.append("")
+                fh.write(f"- Error reading data: {e}\n\n")
         else:
-            lines.append("- Sample Data: (Empty Table)")
-            lines.append("")
+            fh.write("- Sample Data: (Empty Table)\n\n")
 
-        lines.append("---")
-        lines.append("")
+        fh.write("---\n")
 
-    return "\n".join(lines)
+    return len(tables)
 
 
 def inspect(db_path_arg: str | None = None, output_path: str | None = None) -> Path:
@@ -144,24 +234,28 @@ def inspect(db_path_arg: str | None = None, output_path: str | None = None) -> P
     out_file = Path(output_path) if output_path else DEFAULT_OUTPUT
     out_file.parent.mkdir(parents=True, exist_ok=True)
 
-    # read-only로 열어서 세이브 파일을 보호
+    # read-only로 열어서 세이브 파일을 보호 (같은 프로세스에서 반복 호출 시 연결 재사용)
     try:
-        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        conn = get_ro_conn(db_path)
     except sqlite3.OperationalError as e:
         raise ConnectionError(f"Cannot open DB (locked or corrupted?): {e}")
 
+    # 임시 파일에 스트리밍으로 쓴 뒤 교체 — 중간에 실패해도 기존 스키마 맵은 그대로 남는다
+    tmp_file = out_file.with_name(out_file.name + ".tmp")
     try:
         cursor = conn.cursor()
-        doc = build_schema_doc(db_path, cursor, conn)
-        out_file.write_text(doc, encoding="utf-8")
+        with open(tmp_file, "w", encoding="utf-8", buffering=1 << 20) as fh:
+            table_count = write_schema_doc(db_path, cursor, conn, fh)
+        tmp_file.replace(out_file)
+        # Planner/Agent 프롬프트용 카탈로그도 함께 저장 (시작 시 스키마 맵 재파싱 방지)
+        write_table_catalog(out_file)
 
-        tables = get_tables(cursor)
         print(f"Done! Schema map saved to: {out_file}")
-        print(f"Tables: {len(tables)}")
+        print(f"Tables: {table_count}")
         print(f"Hint: Open the file and search for 'cash', 'date', 'company' to find key tables.")
         return out_file
     finally:
-        conn.close()
+        tmp_file.unlink(missing_ok=True)
 
 
 if __name__ == "__main__":
@@ -6,8 +6,9 @@ LLM은 SQL 생성과 데이터 해석만 담당하고, 워크플로우 라우팅
 
 Architecture:
     User Question → Pre-Router → (forecast/design 직행 or SQL 파이프라인)
-    SQL Pipeline: Planner → Load Schema → SQL Generator → Executor
-    → Router (retry/advance/analyst) → Analyst → Classifier
+    SQL Pipeline: Planner → Sub Query ×N (서브쿼리별 병렬: 스키마 로드 → SQL 생성 → 실행 → 재시도)
+                  (Planner가 SQL까지 쓴 서브쿼리는 SQL 생성 없이 바로 실행)
+    → Analyst → Classifier
     → (factual/analytical → END)
     → (strategic → Strategist → Aggregator → END)
     → (design → Design Advisor → END)
@@ -20,22 +21,30 @@ Usage:
     poetry run python src/db_query_graph.py "D:\\path\\to\\save.db" -q "..."
 """
 
+import argparse
 import os
 import re
+import sqlite3
 import sys
 import time as _time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable
 
 from dotenv import load_dotenv
 from langgraph.graph import END, StateGraph
 
 from src.graph_state import GraphState, MAX_RETRIES
-from src.graph_utils import build_table_catalog, MODEL_NAME, SCHEMA_MAP_PATH
+from src.graph_utils import (
+    build_table_catalog, embed_text, get_current_turn, ordering_terms, prefetch_schema_map, warm_up_llm,
+    ThinkTagFilter, MODEL_NAME, SCHEMA_MAP_PATH,
+)
 from src.session_memory import get_memory, reset_memory
 from src.nodes_pipeline import (
     pre_router_node, pre_router_router,
-    planner_node, load_schema_node, sql_generator_node,
-    executor_node, router_node, retry_node, advance_node,
+    planner_node, fan_out_sub_queries, sub_query_node,
 )
 from src.nodes_analysis import (
     analyst_node, classifier_node, classifier_router,
@@ -43,6 +52,9 @@ from src.nodes_analysis import (
 )
 from src.nodes_advisors import design_advisor_node, forecast_advisor_node
 
+if TYPE_CHECKING:
+    import numpy as np
+
 load_dotenv()
 
 # ── 설정 ─────────────────────────────────────────────────────────
@@ -51,6 +63,30 @@ if not _db_env:
     raise EnvironmentError("GEARCITY_DB_PATH 환경변수가 설정되지 않았습니다. .env 파일을 확인하세요.")
 DEFAULT_DB_PATH = Path(_db_env)
 
+# 그래프 체크포인트 (langgraph-checkpoint-sqlite 설치 시)
+CHECKPOINT_DB_PATH = Path(__file__).resolve().parent.parent / "data" / "cache" / "graph_checkpoints.db"
+
+
+@lru_cache(maxsize=1)
+def get_checkpointer():
+    """노드 단위로 state를 저장하는 체크포인터 — 실패한 질문을 완료된 단계 다음부터 재개할 수 있다.
+
+    langgraph-checkpoint-sqlite가 있으면 SQLite 파일에, 없으면 프로세스 메모리에 저장한다.
+    """
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError:
+        from langgraph.checkpoint.memory import InMemorySaver
+        return InMemorySaver()
+    CHECKPOINT_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    return SqliteSaver(sqlite3.connect(CHECKPOINT_DB_PATH, check_same_thread=False))
+
+
+def forget_thread(thread_id: str | None) -> None:
+    """thread의 체크포인트를 삭제한다. 지우지 않으면 질문마다 노드별 state 전체가 쌓여 체크포인트 DB가 계속 커진다."""
+    if thread_id:
+        get_checkpointer().delete_thread(thread_id)
+
 
 # ── 그래프 구성 ──────────────────────────────────────────────────
 
@@ -60,11 +96,7 @@ def build_graph() -> StateGraph:
 
     # 노드 등록
     graph.add_node("planner", planner_node)
-    graph.add_node("load_schema", load_schema_node)
-    graph.add_node("sql_generator", sql_generator_node)
-    graph.add_node("executor", executor_node)
-    graph.add_node("retry", retry_node)
-    graph.add_node("advance", advance_node)
+    graph.add_node("sub_query", sub_query_node)
     graph.add_node("analyst", analyst_node)
 
     # 전략 분석 파이프라인 노드
@@ -90,26 +122,10 @@ def build_graph() -> StateGraph:
         "design_advisor": "design_advisor",
         "planner": "planner",
     })
-    graph.add_edge("planner", "load_schema")
-    graph.add_edge("load_schema", "sql_generator")
-    graph.add_edge("sql_generator", "executor")
-
-    # Router: executor 후 조건부 라우팅
-    graph.add_conditional_edges(
-        "executor",
-        router_node,
-        {
-            "retry": "retry",
-            "advance": "advance",
-            "analyst": "analyst",
-        },
-    )
-
-    # retry → load_schema (스키마 다시 로드 후 SQL 재생성)
-    graph.add_edge("retry", "load_schema")
-
-    # advance → load_schema (다음 서브쿼리용 스키마 로드)
-    graph.add_edge("advance", "load_schema")
+    # planner → 서브쿼리마다 sub_query 브랜치 (Send 팬아웃, 각자 SQL 생성/실행/재시도)
+    graph.add_conditional_edges("planner", fan_out_sub_queries, ["sub_query"])
+    # 모든 브랜치가 끝나면 analyst 한 번
+    graph.add_edge("sub_query", "analyst")
 
     # analyst → classifier (전략 분석 파이프라인 진입)
     graph.add_edge("analyst", "classifier")
@@ -135,8 +151,28 @@ def build_graph() -> StateGraph:
     return graph
 
 
+@lru_cache(maxsize=2)
+def get_graph(checkpointed: bool = False):
+    """컴파일된 그래프 싱글톤. 질문마다 노드 등록/컴파일을 반복하지 않는다.
+
+    checkpointed=True면 get_checkpointer()를 붙인 버전 (호출 시 thread_id 필요).
+    """
+    return build_graph().compile(checkpointer=get_checkpointer() if checkpointed else None)
+
+
 # ── 실행 함수 ────────────────────────────────────────────────────
 
+# 최종 답변 LRU: (세이브 경로, mtime_ns, (게임 연도, 월), 정규화된 질문) → (final_answer, 질문 임베딩 또는 None)
+# 게임이 세이브를 다시 쓰면(mtime 변경) 또는 턴이 넘어가면 키가 달라져 자연히 무효화된다.
+_AnswerKey = tuple[str, int, tuple[int, int], str]
+_ANSWER_CACHE: OrderedDict[_AnswerKey, tuple[str, "np.ndarray | None"]] = OrderedDict()
+_ANSWER_CACHE_MAX = 64
+# 같은 세이브 버전에서 임베딩 코사인 유사도가 이 이상인 질문은 답변 재사용 (db_agent 의미 캐시와 같은 기준)
+ANSWER_SIMILARITY = 0.95
+# 연도/개수 등 숫자만 다른 질문("1925년 판매량" vs "1926년 판매량")이나
+# 최상급/정렬/부정 표현만 다른 질문("가장 높은" vs "가장 낮은")은 유사도가 높아도 재사용하지 않는다
+_RE_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
 def _fmt_pre_router(state: dict) -> str | None:
     qtype = state.get("question_type", "")
     mem = get_memory()
@@ -162,48 +198,23 @@ def _fmt_planner(state: dict) -> str | None:
     return None
 
 
-def _fmt_load_schema(state: dict) -> str | None:
-    ctx = state.get("schema_context", "")
-    tables = re.findall(r"## Table: (\S+)", ctx)
-    return f"스키마 로드: {', '.join(tables)}" if tables else None
-
-
-def _fmt_sql_generator(state: dict) -> str | None:
-    idx = state.get("current_index", 0)
-    sqs = state.get("sub_queries", [])
-    if idx < len(sqs):
-        sq = sqs[idx]
-        sql = sq.get("sql", "")
-        sql_preview = sql[:120].replace("\n", " ") + ("..." if len(sql) > 120 else "")
-        return f"SQL 생성 ({idx+1}/{len(sqs)}): {sql_preview}"
-    return None
-
-
-def _fmt_executor(state: dict) -> str | None:
-    idx = state.get("current_index", 0)
+def _fmt_sub_query(state: dict) -> str | None:
     sqs = state.get("sub_queries", [])
-    if idx < len(sqs):
-        sq = sqs[idx]
+    if not sqs:
+        return None
+    lines = []
+    for sq in sqs:
+        retry = f", 재시도 {sq['retry_count']}회" if sq.get("retry_count") else ""
         if sq.get("error"):
-            return f"SQL 실행 실패 ({idx+1}/{len(sqs)}): {sq['error'][:80]}"
+            lines.append(f"  {sq['id']}. 실패{retry}: {sq['error'][:80]}")
+            continue
         result = sq.get("result", "")
-        rows = result.count("\n") - 1 if result and result != "(No results)" else 0
-        return f"SQL 실행 완료 ({idx+1}/{len(sqs)}): {max(0,rows)}행 반환"
-    return None
-
-
-def _fmt_retry(state: dict) -> str | None:
-    idx = state.get("current_index", 0)
-    sqs = state.get("sub_queries", [])
-    if idx < len(sqs):
-        return f"재시도 ({sqs[idx].get('retry_count',0)}/{MAX_RETRIES})"
-    return None
-
-
-def _fmt_advance(state: dict) -> str | None:
-    idx = state.get("current_index", 0)
-    total = len(state.get("sub_queries", []))
-    return f"다음 서브쿼리로 이동 ({idx}/{total})"
+        # CSV: 헤더 1줄 + 행마다 1줄
+        rows = result.count("\n") if result and result != "(No results)" else 0
+        sql = sq.get("sql", "")
+        sql_preview = sql[:120].replace("\n", " ") + ("..." if len(sql) > 120 else "")
+        lines.append(f"  {sq['id']}. {rows}행 반환{retry}: {sql_preview}")
+    return f"SQL 실행 완료 ({len(sqs)}개 병렬):\n" + "\n".join(lines)
 
 
 def _fmt_analyst(state: dict) -> str | None:
@@ -235,11 +246,7 @@ def _fmt_strategy_evaluator(state: dict) -> str | None:
 _NODE_FORMATTERS: dict[str, callable] = {
     "pre_router": _fmt_pre_router,
     "planner": _fmt_planner,
-    "load_schema": _fmt_load_schema,
-    "sql_generator": _fmt_sql_generator,
-    "executor": _fmt_executor,
-    "retry": _fmt_retry,
-    "advance": _fmt_advance,
+    "sub_query": _fmt_sub_query,
     "analyst": _fmt_analyst,
     "classifier": _fmt_classifier,
     "strategist": _fmt_strategist,
@@ -256,22 +263,59 @@ def _format_node_progress(node_name: str, state: dict) -> str | None:
     return formatter(state) if formatter else None
 
 
-def run_query(question: str, db_path: Path, verbose: bool = False) -> str:
-    """질문을 받아 최종 답변을 반환한다."""
+# 답변 토큰을 사용자에게 바로 흘려보내는 노드 (최종 답변을 생성하는 LLM 호출)
+STREAMED_NODES = {"analyst", "aggregator"}
+
+
+def run_query(
+    question: str,
+    db_path: Path,
+    verbose: bool = False,
+    on_token: Callable[[str], None] | None = None,
+    thread_id: str | None = None,
+    resume: bool = False,
+) -> str:
+    """질문을 받아 최종 답변을 반환한다.
+
+    on_token을 주면 STREAMED_NODES의 답변 토큰을 생성되는 대로(<think> 구간 제외) 전달한다.
+    thread_id를 주면 노드마다 체크포인트를 남기고, resume=True면 그 thread의 마지막
+    체크포인트부터 이어서 실행한다. (Planner/SQL 등 이미 끝난 LLM 호출을 다시 하지 않음)
+    정상 완료된 thread의 체크포인트는 바로 지운다 — 실패한 thread만 재개용으로 남는다.
+    같은 세이브(mtime·게임 턴 동일)에서 이미 답한 질문은 _ANSWER_CACHE의 답변을 바로 반환한다.
+    """
     if not db_path.exists():
         raise FileNotFoundError(f"DB file not found: {db_path}")
     if not SCHEMA_MAP_PATH.exists():
         raise FileNotFoundError(f"Schema map not found: {SCHEMA_MAP_PATH}")
 
-    graph = build_graph()
-    app = graph.compile()
+    # 같은 세이브 버전에서 같은(또는 거의 같은) 질문이면 그래프를 돌리지 않고 이전 답변을 그대로 반환
+    cache_key = (
+        str(db_path), db_path.stat().st_mtime_ns, get_current_turn(db_path), " ".join(question.lower().split()),
+    )
+    vec = None
+    if not resume:
+        hit_key, note = cache_key, "같은 질문"
+        if cache_key not in _ANSWER_CACHE:
+            vec = embed_text(question)
+            hit_key, sim = _similar_cached_question(cache_key, vec)
+            note = f"비슷한 질문 ({sim:.3f})"
+        if hit_key is not None:
+            _ANSWER_CACHE.move_to_end(hit_key)
+            if verbose:
+                sys.stdout.buffer.write(f"\033[90m[캐시] 같은 세이브의 {note} — 이전 답변 재사용\033[0m\n\n".encode("utf-8"))
+                sys.stdout.buffer.flush()
+            return _ANSWER_CACHE[hit_key][0]
+
+    # 스키마 맵 파싱을 pre_router(및 첫 호출의 그래프 컴파일)와 병렬로 (캐시돼 있으면 즉시 종료)
+    prefetch_schema_map()
+
+    app = get_graph(checkpointed=thread_id is not None)
+    config = {"configurable": {"thread_id": thread_id}} if thread_id else None
 
     initial_state: GraphState = {
         "user_question": question,
         "db_path": str(db_path),
         "sub_queries": [],
-        "current_index": 0,
-        "schema_context": "",
         "final_answer": "",
         "max_retries": MAX_RETRIES,
         "error_log": [],
@@ -287,11 +331,15 @@ def run_query(question: str, db_path: Path, verbose: bool = False) -> str:
         "memory_context": "",
     }
 
-    if not verbose:
-        result = app.invoke(initial_state)
-        return result["final_answer"]
+    # 재개 시 입력 없이 호출하면 체크포인트의 state/대기 중인 노드부터 실행
+    graph_input = None if resume else initial_state
+
+    if not verbose and on_token is None:
+        result = app.invoke(graph_input, config)
+        forget_thread(thread_id)
+        return _remember_answer(cache_key, result["final_answer"], vec)
 
-    # ── verbose 모드: stream으로 노드별 진행 상황 출력 ──
+    # ── stream 모드: 노드별 진행 상황(verbose) + 답변 토큰(on_token) ──
     _write = lambda s: (
         sys.stdout.buffer.write(s.encode("utf-8", errors="replace")),
         sys.stdout.buffer.flush(),
@@ -299,24 +347,86 @@ def run_query(question: str, db_path: Path, verbose: bool = False) -> str:
     step = 0
     t0 = _time.time()
     last_state = initial_state
-
-    for chunk in app.stream(initial_state, stream_mode="updates"):
-        for node_name, state_update in chunk.items():
+    # updates: 어떤 노드가 끝났는지 / values: reducer까지 적용된 전체 state
+    # messages: LLM 토큰 / custom: 노드가 LLM 없이 직접 내보내는 답변 텍스트
+    modes = ["updates", "values", "messages", "custom"] if on_token else ["updates", "values"]
+    think = ThinkTagFilter()
+    finished: list[str] = []
+
+    for mode, chunk in app.stream(graph_input, config, stream_mode=modes):
+        if mode == "custom":
+            on_token(chunk)
+            continue
+
+        if mode == "messages":
+            message, meta = chunk
+            if meta.get("langgraph_node") in STREAMED_NODES:
+                text = think.feed(message.content)
+                if text:
+                    on_token(text)
+            continue
+
+        if mode == "updates":
+            for node_name in chunk:
+                finished.append(node_name)
+                if on_token and node_name in STREAMED_NODES:
+                    on_token(think.flush() + "\n\n")
+                    think = ThinkTagFilter()
+            continue
+
+        last_state = chunk
+        # 팬아웃된 sub_query 브랜치들은 같은 step에 끝나므로 한 번만 출력
+        for node_name in dict.fromkeys(finished):
             step += 1
             elapsed = _time.time() - t0
-            # state 병합 (stream은 delta만 반환)
-            last_state = {**last_state, **state_update}
-            msg = _format_node_progress(node_name, last_state)
+            msg = _format_node_progress(node_name, last_state) if verbose else ""
             if msg:
                 header = f"[{elapsed:5.1f}s] Step {step}: {node_name}"
                 _write(f"\033[90m{header}\033[0m\n")
                 for line in msg.split("\n"):
                     _write(f"\033[90m  {line}\033[0m\n")
                 _write("\n")
-
-    total = _time.time() - t0
-    _write(f"\033[90m[{total:.1f}s] 완료 ({step} steps)\033[0m\n\n")
-    return last_state.get("final_answer", "")
+        finished.clear()
+
+    if verbose:
+        total = _time.time() - t0
+        _write(f"\033[90m[{total:.1f}s] 완료 ({step} steps)\033[0m\n\n")
+    forget_thread(thread_id)
+    return _remember_answer(cache_key, last_state.get("final_answer", ""), vec)
+
+
+def _similar_cached_question(
+    key: _AnswerKey, vec: "np.ndarray | None"
+) -> tuple[_AnswerKey | None, float]:
+    """같은 세이브 버전/턴의 캐시된 질문 중 임베딩이 가장 비슷한 것의 (키, 유사도).
+
+    ANSWER_SIMILARITY 미만이거나 질문 속 숫자·최상급/정렬/부정 표현이 다르면 (None, 최고 유사도).
+    """
+    best_key, best_sim = None, 0.0
+    if vec is None:
+        return best_key, best_sim
+    numbers = _RE_NUMBER.findall(key[3])
+    terms = ordering_terms(key[3])
+    for cached_key, (_, cached_vec) in _ANSWER_CACHE.items():
+        if cached_vec is None or cached_key[:3] != key[:3]:
+            continue
+        sim = float(cached_vec @ vec)
+        if (
+            sim > best_sim
+            and _RE_NUMBER.findall(cached_key[3]) == numbers
+            and ordering_terms(cached_key[3]) == terms
+        ):
+            best_key, best_sim = cached_key, sim
+    return (best_key if best_sim >= ANSWER_SIMILARITY else None), best_sim
+
+
+def _remember_answer(key: _AnswerKey, answer: str, vec: "np.ndarray | None" = None) -> str:
+    """run_query 답변을 (질문 임베딩과 함께) _ANSWER_CACHE에 넣고 그대로 반환. 빈 답변은 캐시하지 않는다."""
+    if answer:
+        _ANSWER_CACHE[key] = (answer, vec)
+        if len(_ANSWER_CACHE) > _ANSWER_CACHE_MAX:
+            _ANSWER_CACHE.popitem(last=False)
+    return answer
 
 
 # ── 테스트 쿼리 ──────────────────────────────────────────────────
@@ -340,6 +450,43 @@ TEST_QUERIES = [
 ]
 
 
+class _TokenPrinter:
+    """run_query(on_token=...)용: 답변 토큰을 stdout에 바로 쓴다. 첫 토큰 앞에 prefix 출력."""
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self.printed = False
+        self._streamed: list[str] = []
+
+    def __call__(self, text: str) -> None:
+        if not self.printed:
+            # <think> 뒤 빈 줄 등 답변 앞 공백은 건너뛴다
+            text = text.lstrip()
+            if not text:
+                return
+            self._streamed.append(text)
+            text = self.prefix + text
+            self.printed = True
+        else:
+            self._streamed.append(text)
+        # Windows cp949 인코딩 문제 방지
+        sys.stdout.buffer.write(text.encode("utf-8", errors="replace"))
+        sys.stdout.buffer.flush()
+
+    def finish(self, answer: str, end: str = "\n") -> None:
+        """최종 답변이 이미 스트리밍된 텍스트에 없으면 출력한다.
+
+        analyst가 스트리밍한 뒤 설계/예측 자문으로 라우팅되면 final_answer가 바뀌므로
+        printed 여부만으로는 부족하다 (공백 차이는 무시하고 비교).
+        """
+        streamed = " ".join("".join(self._streamed).split())
+        if " ".join(answer.split()) in streamed:
+            return
+        if self.printed:
+            self("\n")
+        self(f"{answer}{end}")
+
+
 def run_tests(db_path: Path, verbose: bool = False):
     """사전 정의된 테스트 질문을 실행한다."""
     for t in TEST_QUERIES:
@@ -361,6 +508,9 @@ def run_interactive(db_path: Path, verbose: bool = True):
     v_label = " (verbose)" if verbose else ""
     print(f"\n[대화형 모드{v_label}] 질문을 입력하세요 (quit으로 종료).")
     print("한국어/영어 모두 가능합니다.\n")
+    session_id = uuid.uuid4().hex[:8]
+    failed: tuple[str, str] | None = None  # (질문, thread_id) — retry로 재개할 실패한 질문
+    turn = 0
     while True:
         try:
             question = input("You> ").strip()
@@ -368,37 +518,65 @@ def run_interactive(db_path: Path, verbose: bool = True):
             break
         if not question or question.lower() in ("quit", "exit", "q"):
             break
+
+        resume = question.lower() == "retry" and failed is not None
+        if resume:
+            question, thread_id = failed
+        else:
+            # 재개하지 않고 새 질문으로 넘어가면 실패한 thread는 더 쓸 일이 없다
+            if failed is not None:
+                forget_thread(failed[1])
+                failed = None
+            # 질문마다 새 thread (이전 질문의 state가 섞이지 않도록)
+            turn += 1
+            thread_id = f"{session_id}-{turn}"
         try:
             print()
-            answer = run_query(question, db_path, verbose=verbose)
-            # Windows cp949 인코딩 문제 방지
-            sys.stdout.buffer.write(f"Agent> {answer}\n\n".encode("utf-8", errors="replace"))
-            sys.stdout.buffer.flush()
+            printer = _TokenPrinter(prefix="Agent> ")
+            answer = run_query(
+                question, db_path, verbose=verbose, on_token=printer,
+                thread_id=thread_id, resume=resume,
+            )
+            failed = None
+            # 스트리밍 노드를 거치지 않은 답변(설계/예측 자문)은 여기서 한 번에 출력
+            printer.finish(answer, end="\n\n")
         except Exception as e:
-            print(f"\nError: {e}\n")
+            failed = (question, thread_id)
+            print(f"\nError: {e}")
+            print("('retry' 입력 시 완료된 단계는 건너뛰고 실패한 단계부터 다시 실행)\n")
+
+    # session_id가 매번 새로 만들어지므로 다음 실행에서는 이 세션의 thread를 재개할 수 없다
+    if failed is not None:
+        forget_thread(failed[1])
 
 
 # ── CLI ──────────────────────────────────────────────────────────
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="GearCity DB Query Graph (LangGraph Multi-Step SQL Agent)")
+    parser.add_argument(
+        "db", nargs="?", type=Path, default=DEFAULT_DB_PATH,
+        help=f"세이브 파일(.db) 경로 (default: {DEFAULT_DB_PATH})",
+    )
+    parser.add_argument(
+        "-q", "--query",
+        help="단일 질문 실행 후 종료",
+    )
+    parser.add_argument(
+        "--test", action="store_true",
+        help="테스트 쿼리 실행",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help="노드별 진행 상황 출력 (--test)",
+    )
+    return parser.parse_args()
+
+
 def main():
-    db_path = DEFAULT_DB_PATH
-    question = None
-    test_mode = False
-    verbose = False
-
-    args = sys.argv[1:]
-    i = 0
-    while i < len(args):
-        if args[i] in ("-q", "--query") and i + 1 < len(args):
-            question = args[i + 1]
-            i += 1
-        elif args[i] == "--test":
-            test_mode = True
-        elif args[i] in ("-v", "--verbose"):
-            verbose = True
-        elif not args[i].startswith("-"):
-            db_path = Path(args[i])
-        i += 1
+    args = parse_args()
+    db_path = args.db
+    question = args.query
 
     print(f"DB: {db_path}")
     print(f"Model: {MODEL_NAME}")
@@ -411,21 +589,23 @@ def main():
         print(f"Error: Schema map not found: {SCHEMA_MAP_PATH}")
         sys.exit(1)
 
+    # 첫 질문 입력/카탈로그 로드와 겹쳐서 모델 로드 (콜드 스타트 회피)
+    warm_up_llm()
+
     # 스키마 카탈로그 확인
     catalog = build_table_catalog()
     table_count = catalog.count("\n") + 1
     print(f"Tables in catalog: {table_count}")
     print()
 
-    if test_mode:
-        run_tests(db_path, verbose=verbose)
+    if args.test:
+        run_tests(db_path, verbose=args.verbose)
     elif question:
         reset_memory()
         print(f"Question: {question}\n")
-        answer = run_query(question, db_path, verbose=verbose or True)
-        sys.stdout.buffer.write(answer.encode("utf-8", errors="replace"))
-        sys.stdout.buffer.write(b"\n")
-        sys.stdout.buffer.flush()
+        printer = _TokenPrinter()
+        answer = run_query(question, db_path, verbose=True, on_token=printer)
+        printer.finish(answer)
     else:
         run_interactive(db_path, verbose=True)
 
@@ -38,6 +38,14 @@ class SubQuery(TypedDict):
     retry_count: int
 
 
+class SubQueryTask(TypedDict):
+    """fan_out_sub_queries가 Send로 sub_query 노드에 넘기는 입력 (서브쿼리 1개분)."""
+    db_path: str
+    index: int  # state["sub_queries"] 내 위치 — 결과를 {index: 서브쿼리}로 merge
+    sub_query: SubQuery
+    max_retries: int
+
+
 class StrategyCandidate(TypedDict):
     id: int
     name: str
@@ -57,15 +65,30 @@ class StrategyEvaluation(TypedDict):
     score: float
 
 
+def merge_sub_queries(
+    old: list[SubQuery], new: list[SubQuery] | dict[int, dict]
+) -> list[SubQuery]:
+    """sub_queries reducer.
+
+    list는 전체 교체(Planner), {인덱스: 변경 필드} dict는 해당 서브쿼리만 갱신한다.
+    병렬 sub_query 브랜치가 각자 자기 서브쿼리만 돌려주고, 같은 step에서 모두 합쳐진다.
+    """
+    if not isinstance(new, dict):
+        return new
+    # 새 리스트에 적용 — 이전 리스트는 stream(values)로 이미 내보낸 state가 그대로 참조하고 있다
+    old = list(old)
+    for i, patch in new.items():
+        old[i] = {**old[i], **patch}
+    return old
+
+
 class GraphState(TypedDict):
     user_question: str
     db_path: str  # SQLite DB 파일 경로
-    sub_queries: list[SubQuery]
-    current_index: int
-    schema_context: str
+    sub_queries: Annotated[list[SubQuery], merge_sub_queries]  # 노드는 {idx: 변경 필드}만 반환
     final_answer: str
     max_retries: int
-    error_log: list[str]
+    error_log: Annotated[list[str], operator.add]  # 노드는 새 에러 메시지만 반환
     # 전략 분석 파이프라인 필드
     question_type: str  # "factual" | "analytical" | "strategic" | "design"
     analyst_summary: str  # analyst의 중간 결과 (downstream 전달용)
@@ -1,14 +1,25 @@
 """
-GearCity Graph Utilities — 스키마 파싱, SQL 정리, LLM 팩토리
+GearCity Graph Utilities — 스키마 파싱, 결과 포맷팅, SQL 정리, LLM 팩토리
 =============================================================
 """
 
+import atexit
+import csv
+import io
 import os
 import re
+import sqlite3
+import threading
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING, Collection, TextIO
 
 from dotenv import load_dotenv
-from langchain_ollama import ChatOllama
+
+from src.queries import CURRENT_DATE_SQL, GAME_STATE_SQL, PLAYER_STATE_SQL
+
+if TYPE_CHECKING:
+    from langchain_ollama import ChatOllama
 
 load_dotenv()
 
@@ -16,6 +27,7 @@ load_dotenv()
 
 SCHEMA_MAP_PATH = Path(__file__).resolve().parent.parent / "data" / "schema" / "db_schema_map.txt"
 MODEL_NAME = os.getenv("OLLAMA_MODEL", "qwen3:30b")
+EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "mxbai-embed-large")
 
 # ── LLM 토큰 제한 ───────────────────────────────────────────────
 # 노드 역할별 최대 출력 토큰 — 무한 생성 루프 방지
@@ -23,65 +35,410 @@ MODEL_NAME = os.getenv("OLLAMA_MODEL", "qwen3:30b")
 
 LLM_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "49152"))
 LLM_MAX_TOKENS_SQL = 512       # SQL 생성: SELECT 문 1개
-LLM_MAX_TOKENS_PLAN = 1024     # Planner: SUB/TABLES 5개
+LLM_MAX_TOKENS_PLAN = 2048     # Planner: SUB/TABLES/SQL 5개
 LLM_MAX_TOKENS_ANALYSIS = 3000  # Analyst/Strategist/Aggregator: 종합 분석
 LLM_MAX_TOKENS_DESIGN = 49152  # Design Advisor: num_ctx와 동일. 실제 한도는 num_ctx - input_tokens
 LLM_MAX_TOKENS_CLASSIFY = 32   # Classifier: 단어 1개
 
+# 모델(+ 시스템 프롬프트 KV 캐시)을 메모리에 유지하는 시간 — 질문마다 재로딩/재prefill 방지
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "24h")
+
+# GPU에 올릴 레이어 수. 미설정이면 Ollama가 VRAM에 맞춰 자동 분할.
+# VRAM이 빠듯해 일부 레이어가 CPU로 밀리면 토큰당 속도가 크게 떨어지므로, 양자화 태그를 낮추거나
+# (예: q8_0 → q4_K_M) 이 값으로 오프로드를 고정한다. num_ctx처럼 바뀌면 모델이 다시 로드된다.
+_num_gpu_env = os.getenv("OLLAMA_NUM_GPU")
+LLM_NUM_GPU = int(_num_gpu_env) if _num_gpu_env else None
+
+
+# Ollama HTTP 연결 풀: 노드마다 create_llm()으로 새 ChatOllama를 만들어도 TCP 연결은 재사용.
+# 생성 응답 사이 간격(다른 노드의 LLM 호출 시간)이 기본 5초보다 길어서 keep-alive를 늘린다.
+OLLAMA_HTTP_KEEPALIVE = 60.0
+OLLAMA_HTTP_MAX_CONNECTIONS = 32
+
+
+@lru_cache(maxsize=1)
+def _ollama_transport():
+    import httpx
+
+    transport = httpx.HTTPTransport(
+        limits=httpx.Limits(
+            max_connections=OLLAMA_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=OLLAMA_HTTP_KEEPALIVE,
+        )
+    )
+    atexit.register(transport.close)
+    return transport
+
+
+def ollama_sync_client_kwargs() -> dict:
+    """ChatOllama/OllamaEmbeddings의 sync_client_kwargs — 프로세스 전체가 연결 풀 하나를 공유한다.
+
+    async 클라이언트는 이벤트 루프에 묶이므로(asyncio.run마다 새 루프) 공유하지 않는다.
+    """
+    return {"transport": _ollama_transport()}
+
+
+@lru_cache(maxsize=16)
+def create_llm(temperature: float = 0, max_tokens: int = LLM_MAX_TOKENS_ANALYSIS) -> "ChatOllama":
+    """(temperature, max_tokens) 조합별로 ChatOllama 하나를 만들어 재사용한다."""
+    # langchain_ollama는 실제로 LLM을 만들 때만 import (스키마/DB 유틸만 쓰는 스크립트의 시작 시간 단축)
+    from langchain_ollama import ChatOllama
 
-def create_llm(temperature: float = 0, max_tokens: int = LLM_MAX_TOKENS_ANALYSIS) -> ChatOllama:
     return ChatOllama(
         model=MODEL_NAME,
         temperature=temperature,
-        num_ctx=LLM_NUM_CTX,
+        num_ctx=LLM_NUM_CTX,  # num_ctx가 바뀌면 Ollama가 모델을 다시 로드하므로 고정
+        num_gpu=LLM_NUM_GPU,
         num_predict=max_tokens,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        sync_client_kwargs=ollama_sync_client_kwargs(),
     )
 
 
+@lru_cache(maxsize=1)
+def _embedder():
+    from langchain_ollama import OllamaEmbeddings
+
+    return OllamaEmbeddings(model=EMBED_MODEL, sync_client_kwargs=ollama_sync_client_kwargs())
+
+
+_embed_disabled = False
+
+
+def embed_text(text: str):
+    """L2 정규화된 float32 임베딩 (np.ndarray). 임베딩 모델을 쓸 수 없으면 None — 이후 호출도 바로 None.
+
+    대소문자/공백을 정규화한 텍스트 기준으로 캐시 — run_query의 답변 캐시와 Classifier가
+    같은 질문을 임베딩해도 Ollama 요청은 한 번이다. 반환된 배열은 공유되므로 수정하지 않는다.
+    """
+    return _embed_normalized(" ".join(text.lower().split()))
+
+
+@lru_cache(maxsize=256)
+def _embed_normalized(text: str):
+    global _embed_disabled
+    if _embed_disabled:
+        return None
+    import numpy as np
+
+    try:
+        vec = np.asarray(_embedder().embed_query(text), dtype=np.float32)
+    except Exception as e:
+        print(f"[Embedding] disabled ({EMBED_MODEL}): {e}")
+        _embed_disabled = True
+        return None
+    return vec / (np.linalg.norm(vec) or 1.0)
+
+
+# 최상급/정렬 방향/부정 표현. 임베딩은 "가장 높은"과 "가장 낮은"을 거의 같은 질문으로 보므로
+# 유사 질문 캐시는 이 단어들이 똑같은 질문끼리만 매칭한다.
+_RE_ORDERING = re.compile(
+    r"(?<![a-z])(?:highest|lowest|largest|smallest|biggest|greatest|fewest|most|least|"
+    r"max(?:imum)?|min(?:imum)?|top|bottom|best|worst|first|last|asc(?:ending)?|desc(?:ending)?|"
+    r"increas\w*|decreas\w*|more|less|not|no|never|without|except|excluding|\w+n't)(?![a-z])"
+    r"|최고|최저|최대|최소|최다|가장|상위|하위|오름차순|내림차순|높은|높게|낮은|낮게|많은|많이|"
+    r"적은|적게|큰|크게|작은|작게|아닌|아니|않|없|제외|빼고|말고"
+)
+
+
+def ordering_terms(text: str) -> list[str]:
+    """질문 속 최상급/정렬 방향/부정 표현 목록 (소문자, 등장 순서)."""
+    return _RE_ORDERING.findall(text.lower())
+
+
+def _warm_up() -> None:
+    try:
+        create_llm(max_tokens=1).invoke("hi")
+    except Exception:
+        pass  # Ollama 미실행 등 — 실제 질문 시점에 같은 오류가 드러난다
+
+
+def warm_up_llm() -> None:
+    """첫 질문 전에 모델을 Ollama 메모리에 올려 둔다 (백그라운드 스레드, 1토큰 생성).
+
+    num_ctx가 실제 호출과 같아야 재로딩이 없으므로 create_llm을 그대로 쓴다.
+    GEARCITY_WARMUP=0이면 생략.
+    """
+    if os.getenv("GEARCITY_WARMUP", "1") != "1":
+        return
+    threading.Thread(target=_warm_up, daemon=True).start()
+
+
+# ── 세이브 DB 연결 ───────────────────────────────────────────────
+# 읽기 전용 분석용 튜닝: 쓰기 차단, 임시 테이블(ORDER BY/GROUP BY 정렬용)은 메모리에,
+# 256MB mmap으로 read() 시스콜 대신 페이지 매핑, 페이지 캐시 64MB
+RO_PRAGMAS = (
+    "PRAGMA query_only=1",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+
+def connect_ro(db_path: Path | str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """세이브 파일을 read-only(URI mode=ro)로 열고 조회용 PRAGMA를 적용한다.
+
+    같은 SQL 문자열은 sqlite3 모듈의 연결별 statement 캐시가 prepare 결과를 재사용한다.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=check_same_thread)
+    for pragma in RO_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+# 세이브 경로별 공유 read-only 연결: {경로: (mtime, 연결)}
+_CONN_POOL: dict[Path, tuple[float, sqlite3.Connection]] = {}
+_CONN_POOL_LOCK = threading.Lock()
+
+
+def get_ro_conn(db_path: Path | str) -> sqlite3.Connection:
+    """경로별로 한 번 연 read-only 연결을 재사용한다. (페이지 캐시/mmap이 호출 간에 유지됨)
+
+    게임이 세이브를 다시 쓰면(mtime 변경) 파일이 교체됐을 수 있으므로 새로 연다. 이전 연결은 닫지 않고
+    풀에서만 뺀다 — 병렬 sub_query나 순회 중인 커서가 아직 쓰고 있을 수 있고, 마지막 참조가 사라지면 GC가 닫는다.
+    반환된 연결은 풀 소유이므로 호출자가 close() 하지 않는다. 종료 시 atexit에서 일괄 정리.
+    """
+    path = Path(db_path).resolve()
+    mtime = path.stat().st_mtime
+    with _CONN_POOL_LOCK:
+        entry = _CONN_POOL.get(path)
+        if entry and entry[0] == mtime:
+            return entry[1]
+        conn = connect_ro(path, check_same_thread=False)
+        _CONN_POOL[path] = (mtime, conn)
+        return conn
+
+
+@atexit.register
+def close_ro_conns() -> None:
+    """풀에 있는 연결을 모두 닫는다."""
+    with _CONN_POOL_LOCK:
+        for _, conn in _CONN_POOL.values():
+            conn.close()
+        _CONN_POOL.clear()
+
+
+def load_player_state(conn: sqlite3.Connection) -> dict[str, str]:
+    """PlayerInfo 키-값 테이블을 dict로 읽는다. (Company_Name, Player_Name, Company_ID)"""
+    return dict(conn.execute(PLAYER_STATE_SQL).fetchall())
+
+
+def load_game_state(conn: sqlite3.Connection) -> dict[str, str]:
+    """GameInfo 키-값 테이블을 dict로 읽는다. (Current_Year, Current_Turn, Starting_Year ...)"""
+    return dict(conn.execute(GAME_STATE_SQL).fetchall())
+
+
+@lru_cache(maxsize=8)
+def _current_turn_cached(db_path: str, mtime_ns: int) -> tuple[int, int]:
+    info = dict(get_ro_conn(db_path).execute(CURRENT_DATE_SQL).fetchall())
+    return (int(info.get("Current_Year", 0)), int(info.get("Current_Turn", 0)))
+
+
+def get_current_turn(db_path: Path | str) -> tuple[int, int]:
+    """현재 게임 연도/월. 세이브 mtime 기준으로 캐시 — 같은 턴 안의 반복 호출은 조회 없이 반환. 실패 시 (0, 0)."""
+    try:
+        return _current_turn_cached(str(db_path), os.stat(db_path).st_mtime_ns)
+    except (OSError, sqlite3.Error, ValueError):
+        return (0, 0)
+
+
+# ── 쿼리 결과 포맷팅 ─────────────────────────────────────────────
+
+def _cell_text(v) -> str:
+    """결과 셀 문자열. (None은 빈 칸, 실수는 %g, 줄바꿈은 공백으로)"""
+    if v is None:
+        return ""
+    if isinstance(v, float):
+        return f"{v:g}"
+    if isinstance(v, bytes):
+        v = v.decode("utf-8", errors="replace")
+    return str(v).replace("\r\n", " ").replace("\n", " ")
+
+
+def md_table(cols: list[str], rows: list[tuple], fh: TextIO) -> None:
+    """쿼리 결과를 Markdown 파이프 테이블로 fh에 쓴다. 숫자 컬럼은 오른쪽 정렬."""
+    cells = [[_cell_text(v) for v in row] for row in rows]
+    numeric = [
+        all(isinstance(row[i], (int, float)) for row in rows if row[i] is not None)
+        for i in range(len(cols))
+    ]
+    widths = [
+        max([len(c)] + [len(r[i]) for r in cells])
+        for i, c in enumerate(cols)
+    ]
+
+    def line(values: list[str]) -> str:
+        return "| " + " | ".join(
+            v.rjust(w) if num else v.ljust(w)
+            for v, w, num in zip(values, widths, numeric)
+        ) + " |\n"
+
+    fh.write(line(cols))
+    fh.write("|" + "|".join(
+        "-" * (w + 1) + ":" if num else ":" + "-" * (w + 1)
+        for w, num in zip(widths, numeric)
+    ) + "|\n")
+    for r in cells:
+        fh.write(line(r))
+
+
+def cursor_to_csv(cursor: sqlite3.Cursor, limit: int = 30) -> str:
+    """실행된 커서에서 최대 limit행을 읽어 CSV 문자열로 (헤더 행 포함). 결과가 없으면 빈 문자열.
+
+    LLM 컨텍스트용: 열 폭 맞춤 공백이 없어 Markdown 테이블보다 토큰이 훨씬 적다.
+    """
+    rows = cursor.fetchmany(limit)
+    if not rows:
+        return ""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow([d[0] for d in cursor.description])
+    writer.writerows([_cell_text(v) for v in row] for row in rows)
+    return buf.getvalue().rstrip("\n")
+
+
 # ── 스키마 파싱 유틸리티 ─────────────────────────────────────────
 
-def build_table_catalog(schema_path: Path = SCHEMA_MAP_PATH) -> str:
-    """71개 테이블 요약 카탈로그 (~3KB) — Planner가 테이블 선택에 활용."""
+# 매 LLM 턴마다 쓰는 정규식은 모듈 로드 시 1회 컴파일
+_RE_CATALOG = re.compile(r"^## Table: (\S+) \((~?\d+) rows\)\s*\n\n- Columns: (.+)", re.MULTILINE)
+_RE_COL = re.compile(r"(\w+) \(")
+_RE_SECTION_HEAD = re.compile(r"^## Table: (.+?) \(", re.MULTILINE)
+_RE_THINK = re.compile(r"<think>.*?</think>", re.DOTALL)
+_RE_FENCE = re.compile(r"```(?:sql)?\s*\n?(.*?)```", re.DOTALL | re.IGNORECASE)
+_RE_SELECT = re.compile(r"(SELECT\s.+)", re.DOTALL | re.IGNORECASE)
+# db_inspector가 각 섹션에 쓰는 샘플 데이터 표 시작 줄
+_SAMPLE_MARKER = "\n- Sample Data:"
+
+
+@lru_cache(maxsize=4)
+def _parse_schema_map(
+    schema_path: Path, mtime_ns: int
+) -> tuple[str, dict[str, str], dict[str, str]]:
+    """스키마 맵을 한 번 읽어 (카탈로그 문자열, {테이블: 섹션 전문}, {테이블: 샘플 제외 섹션})으로 파싱한다.
+
+    (경로, mtime) 키로 캐시 — 파일이 다시 생성되기 전까지 호출마다 디스크 읽기/정규식 스캔이 없다.
+    """
     text = schema_path.read_text(encoding="utf-8")
     # Windows CRLF 통일
     text = text.replace("\r\n", "\n")
+
     lines = []
-    for m in re.finditer(
-        r"^## Table: (\S+) \((\d+) rows\)\s*\n\n- Columns: (.+)",
-        text,
-        re.MULTILINE,
-    ):
+    for m in _RE_CATALOG.finditer(text):
         name, rows, cols_raw = m.group(1), m.group(2), m.group(3)
         # 컬럼 이름만 추출 (타입/PK 제거)
-        col_names = re.findall(r"(\w+) \(", cols_raw)
+        col_names = _RE_COL.findall(cols_raw)
         lines.append(f"- {name} ({rows} rows): {', '.join(col_names)}")
-    return "\n".join(lines)
+
+    # 각 테이블 섹션: ## Table: Name ( ... 다음 --- 까지
+    sections: dict[str, str] = {}
+    for m in _RE_SECTION_HEAD.finditer(text):
+        end = text.find("\n---", m.end())
+        if end != -1:
+            sections.setdefault(m.group(1), text[m.start():end + 4])
+
+    # 샘플 데이터 표를 뺀 섹션 (헤더 + 컬럼 목록) — 프롬프트 토큰의 대부분이 샘플 표다
+    compact: dict[str, str] = {}
+    for name, section in sections.items():
+        cut = section.find(_SAMPLE_MARKER)
+        compact[name] = section if cut == -1 else section[:cut] + "\n---"
+
+    return "\n".join(lines), sections, compact
+
+
+# 진행 중인 백그라운드 스키마 파싱 (prefetch_schema_map)
+_schema_prefetch: threading.Thread | None = None
+
+
+def _schema_map(schema_path: Path) -> tuple[str, dict[str, str], dict[str, str]]:
+    # 프리페치가 아직 파싱 중이면 같은 파일을 두 번 파싱하지 않도록 끝나길 기다린다
+    t = _schema_prefetch
+    if t is not None and t is not threading.current_thread() and t.is_alive():
+        t.join()
+    return _parse_schema_map(schema_path, schema_path.stat().st_mtime_ns)
+
+
+def _prefetch_worker(schema_path: Path) -> None:
+    try:
+        _parse_schema_map(schema_path, schema_path.stat().st_mtime_ns)
+    except OSError:
+        pass  # 실제 호출 시점에 같은 오류가 다시 난다
+
+
+def prefetch_schema_map(schema_path: Path = SCHEMA_MAP_PATH) -> None:
+    """스키마 맵 파싱을 백그라운드 스레드에서 미리 시작한다.
+
+    그래프 구성/사전 라우팅과 겹쳐 진행되어, Planner가 카탈로그를 찾을 때는 이미 캐시에 있다.
+    """
+    global _schema_prefetch
+    _schema_prefetch = threading.Thread(target=_prefetch_worker, args=(schema_path,), daemon=True)
+    _schema_prefetch.start()
+
+
+def build_table_catalog(schema_path: Path = SCHEMA_MAP_PATH) -> str:
+    """71개 테이블 요약 카탈로그 (~3KB) — Planner가 테이블 선택에 활용."""
+    return _schema_map(schema_path)[0]
+
+
+def catalog_path(schema_path: Path = SCHEMA_MAP_PATH) -> Path:
+    """스키마 맵 옆에 저장하는 테이블 카탈로그 파일 경로. (db_schema_map.txt → db_schema_map.catalog.txt)"""
+    return schema_path.with_name(f"{schema_path.stem}.catalog.txt")
+
+
+def write_table_catalog(schema_path: Path = SCHEMA_MAP_PATH) -> Path:
+    """스키마 맵을 파싱한 카탈로그를 파일로 저장한다. (db_inspector가 맵 생성 직후 호출)"""
+    out = catalog_path(schema_path)
+    out.write_text(build_table_catalog(schema_path), encoding="utf-8")
+    return out
+
+
+def load_table_catalog(schema_path: Path = SCHEMA_MAP_PATH) -> str:
+    """저장된 카탈로그가 스키마 맵보다 새것이면 그대로 읽고, 아니면 다시 파싱해서 저장한다.
+
+    프로세스가 시작될 때마다 스키마 맵 전체(샘플 데이터 포함)를 정규식으로 훑지 않게 한다.
+    """
+    cached = catalog_path(schema_path)
+    try:
+        if cached.stat().st_mtime >= schema_path.stat().st_mtime:
+            return cached.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        pass
+    catalog = build_table_catalog(schema_path)
+    try:
+        cached.write_text(catalog, encoding="utf-8")
+    except OSError:
+        pass
+    return catalog
 
 
 def extract_table_schemas(
-    table_names: list[str], schema_path: Path = SCHEMA_MAP_PATH
+    table_names: list[str],
+    schema_path: Path = SCHEMA_MAP_PATH,
+    sample_tables: Collection[str] | None = None,
 ) -> str:
-    """선택된 테이블의 전체 스키마+샘플 데이터를 추출."""
-    text = schema_path.read_text(encoding="utf-8")
-    text = text.replace("\r\n", "\n")
-    sections = []
-    for tname in table_names:
-        # 각 테이블 섹션 추출: ## Table: Name ... 다음 --- 까지
-        pattern = rf"(## Table: {re.escape(tname)} \(.+?\n---)"
-        m = re.search(pattern, text, re.DOTALL)
-        if m:
-            sections.append(m.group(1))
-    return "\n\n".join(sections)
+    """선택된 테이블의 스키마를 추출.
+
+    sample_tables에 든 테이블만 샘플 데이터 표까지 넣고 나머지는 컬럼 목록만 (None이면 전부 샘플 포함).
+    """
+    _, full, compact = _schema_map(schema_path)
+    if sample_tables is None:
+        return "\n\n".join(full[t] for t in table_names if t in full)
+    return "\n\n".join(
+        (full if t in sample_tables else compact)[t] for t in table_names if t in full
+    )
 
 
 def clean_sql(raw: str) -> str:
     """LLM 출력에서 SQL만 추출. 마크다운 펜스, <think> 태그, 설명 텍스트 제거."""
-    # <think>...</think> 제거
-    cleaned = re.sub(r"<think>.*?</think>", "", raw, flags=re.DOTALL)
-    # 마크다운 코드 펜스에서 SQL 추출
-    fence_match = re.search(r"```(?:sql)?\s*\n?(.*?)```", cleaned, re.DOTALL | re.IGNORECASE)
-    if fence_match:
-        cleaned = fence_match.group(1)
+    cleaned = raw
+    # 대부분의 응답은 태그/펜스 없는 SQL 그대로 — 그때는 정규식 패스를 건너뛴다
+    if "<think>" in cleaned or "```" in cleaned:
+        # <think>...</think> 제거
+        cleaned = _RE_THINK.sub("", cleaned)
+        # 마크다운 코드 펜스에서 SQL 추출
+        fence_match = _RE_FENCE.search(cleaned)
+        if fence_match:
+            cleaned = fence_match.group(1)
     # 앞뒤 공백 제거
     cleaned = cleaned.strip()
     # 여러 SQL 문이 있으면 첫 번째만 사용 (세미콜론 기준)
@@ -89,7 +446,7 @@ def clean_sql(raw: str) -> str:
         cleaned = cleaned.split(";")[0].strip() + ";"
     # SELECT로 시작하지 않으면 SELECT 찾아서 추출
     if not cleaned.upper().startswith("SELECT"):
-        select_match = re.search(r"(SELECT\s.+)", cleaned, re.DOTALL | re.IGNORECASE)
+        select_match = _RE_SELECT.search(cleaned)
         if select_match:
             cleaned = select_match.group(1)
     return cleaned
@@ -97,4 +454,44 @@ def clean_sql(raw: str) -> str:
 
 def strip_think_tags(text: str) -> str:
     """<think>...</think> 태그를 제거한다."""
-    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+    # 대부분의 응답에는 태그가 없다 — 정규식 스캔 없이 바로 반환
+    if "<think>" not in text:
+        return text.strip()
+    return _RE_THINK.sub("", text).strip()
+
+
+class ThinkTagFilter:
+    """스트리밍 토큰에서 <think>...</think> 구간을 걸러낸다. (태그가 청크 경계에 걸쳐도 처리)"""
+
+    def __init__(self):
+        self._buf = ""
+        self._in_think = False
+
+    def feed(self, text: str) -> str:
+        """청크를 받아 지금 내보내도 되는 텍스트를 반환."""
+        self._buf += text
+        out = []
+        while True:
+            tag = "</think>" if self._in_think else "<think>"
+            i = self._buf.find(tag)
+            if i == -1:
+                break
+            if not self._in_think:
+                out.append(self._buf[:i])
+            self._buf = self._buf[i + len(tag):]
+            self._in_think = not self._in_think
+
+        # 버퍼 끝이 태그의 앞부분일 수 있으면 다음 청크까지 보류
+        keep = next(
+            (k for k in range(min(len(tag) - 1, len(self._buf)), 0, -1) if tag.startswith(self._buf[-k:])),
+            0,
+        )
+        if not self._in_think:
+            out.append(self._buf[:len(self._buf) - keep])
+        self._buf = self._buf[len(self._buf) - keep:]
+        return "".join(out)
+
+    def flush(self) -> str:
+        """스트림 종료 시 보류 중인 텍스트를 반환."""
+        rest, self._buf = ("" if self._in_think else self._buf), ""
+        return rest
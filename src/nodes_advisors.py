@@ -4,13 +4,12 @@ GearCity Advisor Nodes — 전문 자문 노드
 design_advisor (다단계 증거 기반 추론), forecast_advisor
 """
 
+import io
 import json
 import re
-import sqlite3
 import sys
 from pathlib import Path
 
-import pandas as pd
 from langchain_core.messages import SystemMessage, HumanMessage
 
 from src.graph_state import GraphState
@@ -24,11 +23,14 @@ from src.prompts import (
     FORECAST_ADVISOR_PROMPT,
 )
 from src.queries import (
-    DESIGN_VEHICLE_SQL, CURRENT_YEAR_SQL, CURRENT_TURN_SQL,
+    DESIGN_VEHICLE_SQL, CURRENT_YEAR_SQL,
     TECH_SKILL_SQL, AVAILABLE_COMPONENTS_SQL_TEMPLATE, PLAYER_CITY_IDS_SQL,
     ENGINE_SUB_COMPONENTS_SQL, CHASSIS_SUB_COMPONENTS_SQL,
 )
-from src.graph_utils import create_llm, strip_think_tags, LLM_MAX_TOKENS_DESIGN
+from src.graph_utils import (
+    create_llm, get_current_turn, get_ro_conn, load_player_state, md_table, strip_think_tags,
+    LLM_MAX_TOKENS_DESIGN,
+)
 
 # ── 설계 자문 시스템 프롬프트 ──
 # 모델에 구애받지 않는 범용 프롬프트. 역할·도메인·출력 규칙을 system role에 고정하여
@@ -127,24 +129,25 @@ def _fetch_vehicle_data(db_path: str) -> tuple[list[dict], str, int]:
     current_year = 1900
 
     try:
-        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
-        conn.row_factory = sqlite3.Row
+        conn = get_ro_conn(db_path)
 
-        cursor = conn.execute(CURRENT_YEAR_SQL)
-        year_row = cursor.fetchone()
+        year_row = conn.execute(CURRENT_YEAR_SQL).fetchone()
         if year_row:
             try:
                 current_year = int(year_row[0])
             except (ValueError, TypeError):
                 pass
 
+        # sqlite3.Row 대신 기본 튜플 행 + 컬럼명 zip (Row의 이름 조회/행 객체 생성 생략)
         cursor = conn.execute(DESIGN_VEHICLE_SQL)
-        rows = [dict(r) for r in cursor.fetchall()]
-        conn.close()
+        cols = [d[0] for d in cursor.description]
+        rows = [dict(zip(cols, r)) for r in cursor.fetchall()]
 
         if rows:
-            df = pd.DataFrame(rows)
-            design_context = df.to_markdown(index=False)
+            # 60+ 컬럼 JOIN 결과 — DataFrame/tabulate 없이 행 튜플에서 바로 Markdown 테이블로
+            buf = io.StringIO()
+            md_table(list(rows[0]), [tuple(r.values()) for r in rows], buf)
+            design_context = buf.getvalue()
         else:
             design_context = "(플레이어 소유 활성 차량 없음)"
 
@@ -156,10 +159,13 @@ def _fetch_vehicle_data(db_path: str) -> tuple[list[dict], str, int]:
 
 def _fetch_tech_components(db_path: str, current_year: int) -> tuple[int, str]:
     """Step 1.5: 기술 레벨 + 사용 가능 컴포넌트."""
+    # pandas는 여기서만 쓰므로 설계 질문이 올 때 import (CLI 시작 시 ~0.25s 절약)
+    import pandas as pd
+
     skill_rnd = 0
     tech_context = ""
     try:
-        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        conn = get_ro_conn(db_path)
 
         cursor = conn.execute(TECH_SKILL_SQL)
         skill_row = cursor.fetchone()
@@ -170,23 +176,29 @@ def _fetch_tech_components(db_path: str, current_year: int) -> tuple[int, str]:
             skill=skill_rnd, year=current_year,
         )
         comp_df = pd.read_sql_query(available_components_sql, conn)
-        conn.close()
 
         if not comp_df.empty:
+            # iterrows 대신 열 단위 문자열 연산으로 항목을 한 번에 만든다
+            # (기어박스 × 기어 CROSS JOIN이라 행 수가 수백 단위로 커진다)
+            name = comp_df["Name"].astype(str)
+            skill = comp_df["SkillReq"].astype(int).astype(str)
+            year = comp_df["Year"].astype(int).astype(str)
+            labels = "  - " + name + " [Skill " + skill + ", Year " + year + "]"
+            is_gb = comp_df["category"] == "Gearbox"
+            if is_gb.any():
+                gb = comp_df[is_gb]
+                labels[is_gb] = (
+                    "  - " + name[is_gb] + " + " + gb["gears_name"].astype(str)
+                    + " (" + gb["Gears"].astype(int).astype(str) + "speed)"
+                    + " [Skill " + skill[is_gb] + "/" + gb["gears_skill"].astype(int).astype(str)
+                    + ", Year " + year[is_gb] + "/" + gb["gears_year"].astype(int).astype(str) + "]"
+                )
+
             parts = []
-            for cat, group in comp_df.groupby("category"):
-                if cat == "Gearbox":
-                    items = []
-                    for _, r in group.iterrows():
-                        items.append(f"  - {r['Name']} + {r['gears_name']} ({int(r['Gears'])}speed) [Skill {int(r['SkillReq'])}/{int(r['gears_skill'])}, Year {int(r['Year'])}/{int(r['gears_year'])}]")
-                    items = sorted(set(items))
-                    parts.append(f"**{cat}** ({len(items)} combos):\n" + "\n".join(items))
-                else:
-                    items = []
-                    for _, r in group.iterrows():
-                        items.append(f"  - {r['Name']} [Skill {int(r['SkillReq'])}, Year {int(r['Year'])}]")
-                    items = sorted(set(items))
-                    parts.append(f"**{cat}** ({len(items)}):\n" + "\n".join(items))
+            for cat, group in labels.groupby(comp_df["category"]):
+                items = sorted(set(group))
+                unit = " combos" if cat == "Gearbox" else ""
+                parts.append(f"**{cat}** ({len(items)}{unit}):\n" + "\n".join(items))
             tech_context = "\n\n".join(parts)
         else:
             tech_context = "(No components available at current skill/year)"
@@ -197,6 +209,14 @@ def _fetch_tech_components(db_path: str, current_year: int) -> tuple[int, str]:
     return skill_rnd, tech_context
 
 
+def _first_row_values(cursor) -> dict:
+    """커서의 첫 행을 {컬럼명: 값} dict로 (NULL 컬럼 제외). 행이 없으면 빈 dict."""
+    r = cursor.fetchone()
+    if r is None:
+        return {}
+    return {d[0]: v for d, v in zip(cursor.description, r) if v is not None}
+
+
 def _fetch_sub_components(db_path: str, rows: list[dict]) -> dict:
     """차량별 엔진/샤시 서브컴포넌트 속성 조회.
 
@@ -207,8 +227,7 @@ def _fetch_sub_components(db_path: str, rows: list[dict]) -> dict:
         return result
 
     try:
-        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
-        conn.row_factory = sqlite3.Row
+        conn = get_ro_conn(db_path)
 
         for row in rows:
             car_id = row.get("Car_ID", 0)
@@ -217,19 +236,13 @@ def _fetch_sub_components(db_path: str, rows: list[dict]) -> dict:
 
             engine_sub = {}
             try:
-                cursor = conn.execute(ENGINE_SUB_COMPONENTS_SQL, (engine_id,))
-                r = cursor.fetchone()
-                if r:
-                    engine_sub = {k: r[k] for k in r.keys() if r[k] is not None}
+                engine_sub = _first_row_values(conn.execute(ENGINE_SUB_COMPONENTS_SQL, (engine_id,)))
             except Exception:
                 pass
 
             chassis_sub = {}
             try:
-                cursor = conn.execute(CHASSIS_SUB_COMPONENTS_SQL, (chassis_id,))
-                r = cursor.fetchone()
-                if r:
-                    chassis_sub = {k: r[k] for k in r.keys() if r[k] is not None}
+                chassis_sub = _first_row_values(conn.execute(CHASSIS_SUB_COMPONENTS_SQL, (chassis_id,)))
             except Exception:
                 pass
 
@@ -246,8 +259,6 @@ def _fetch_sub_components(db_path: str, rows: list[dict]) -> dict:
                 "chassis_sub": chassis_sub,
                 "gearbox_sub": gearbox_sub,
             }
-
-        conn.close()
     except Exception:
         pass
 
@@ -294,12 +305,17 @@ def _bv(v) -> str:
     return "Yes" if v else "No"
 
 
-def _format_slider_context(rows: list[dict]) -> str:
-    """모든 차량의 슬라이더 현재 값 + DB 레이팅을 구조화된 텍스트로 포맷."""
+def _format_slider_context(rows: list[dict], max_chars: int | None = None) -> str:
+    """모든 차량의 슬라이더 현재 값 + DB 레이팅을 구조화된 텍스트로 포맷.
+
+    max_chars를 주면 누적 길이가 max_chars를 넘긴 차량에서 멈춘다.
+    (호출자가 그 길이에서 자르므로 나머지 차량은 포맷해도 버려진다)
+    """
     if not rows:
         return "(활성 차량 없음)"
 
     parts = []
+    length = -2  # "\n\n" 구분자는 parts 사이에만
     for row in rows:
         car_name = f"{row.get('Name', '?')} {row.get('Trim', '')}"
 
@@ -413,6 +429,9 @@ def _format_slider_context(rows: list[dict]) -> str:
             health_section = "\n### ✓ Slider Health: OK (no extreme values detected)"
 
         parts.append(f"## {car_name}\n{section}{ch}{gb}{v}{health_section}")
+        length += len(parts[-1]) + 2
+        if max_chars is not None and length > max_chars:
+            break
 
     return "\n\n".join(parts)
 
@@ -438,16 +457,21 @@ _GENERIC_PATTERNS = [
     r"일반적인\s*(엔진|샤시|기어박스|차량)\s*설계",
 ]
 
+# 스테이지 응답마다 쓰는 정규식은 모듈 로드 시 1회 컴파일
+_RE_GENERIC = re.compile("|".join(_GENERIC_PATTERNS))
+_RE_SLIDER_VALUE = re.compile(r'0\.\d{2}')
+_RE_JSON_FENCE = re.compile(r'```(?:json)?\s*\n?(.*?)\n?```', re.DOTALL)
+_RE_TRAILING_COMMA_OBJ = re.compile(r',\s*}')
+_RE_TRAILING_COMMA_ARR = re.compile(r',\s*]')
+_RE_NUMERIC_FIELD = re.compile(r'"([^"]+)"\s*:\s*([\d.]+)')
+_RE_REASONING = re.compile(r'"reasoning"\s*:\s*"([^"]*)"')
+
 
 def _is_generic_response(text: str) -> bool:
     """응답이 제네릭(교과서적)인지 감지."""
-    for pat in _GENERIC_PATTERNS:
-        if re.search(pat, text):
-            return True
-    slider_values = re.findall(r'0\.\d{2}', text)
-    if len(slider_values) < 3:
+    if _RE_GENERIC.search(text):
         return True
-    return False
+    return len(_RE_SLIDER_VALUE.findall(text)) < 3
 
 
 def _parse_stage_json(text: str) -> dict:
@@ -459,7 +483,7 @@ def _parse_stage_json(text: str) -> dict:
     cleaned = strip_think_tags(text)
 
     # 1. ```json ... ``` 블록 추출
-    json_match = re.search(r'```(?:json)?\s*\n?(.*?)\n?```', cleaned, re.DOTALL)
+    json_match = _RE_JSON_FENCE.search(cleaned)
     if json_match:
         try:
             return json.loads(json_match.group(1).strip())
@@ -475,8 +499,8 @@ def _parse_stage_json(text: str) -> dict:
             return json.loads(candidate)
         except json.JSONDecodeError:
             # 3. trailing comma, 한국어 키, 따옴표 없는 값 등 정리 시도
-            fixed = re.sub(r',\s*}', '}', candidate)  # trailing comma
-            fixed = re.sub(r',\s*]', ']', fixed)  # trailing comma in arrays
+            fixed = _RE_TRAILING_COMMA_OBJ.sub('}', candidate)  # trailing comma
+            fixed = _RE_TRAILING_COMMA_ARR.sub(']', fixed)  # trailing comma in arrays
             try:
                 return json.loads(fixed)
             except json.JSONDecodeError:
@@ -484,14 +508,14 @@ def _parse_stage_json(text: str) -> dict:
 
     # 4. 개별 키-값 추출 fallback (슬라이더 값이라도 건지기)
     sliders = {}
-    for m in re.finditer(r'"([^"]+)"\s*:\s*([\d.]+)', cleaned):
+    for m in _RE_NUMERIC_FIELD.finditer(cleaned):
         try:
             sliders[m.group(1)] = float(m.group(2))
         except ValueError:
             pass
     if sliders:
         # reasoning 추출 시도
-        reasoning_match = re.search(r'"reasoning"\s*:\s*"([^"]*)"', cleaned)
+        reasoning_match = _RE_REASONING.search(cleaned)
         result = {"sliders": sliders}
         if reasoning_match:
             result["reasoning"] = reasoning_match.group(1)
@@ -623,6 +647,10 @@ def _format_current_sliders(row: dict, keys: list[str]) -> str:
 # 설계 자문 노드 — 다단계 증거 기반 추론
 # ═══════════════════════════════════════════════════════════════════
 
+# Stage 0 프롬프트에 넣는 차량 요약 최대 길이
+_VEHICLE_SUMMARY_MAX = 6000
+
+
 def design_advisor_node(state: GraphState) -> dict:
     """설계 자문 노드: 다단계 증거 기반 추론 파이프라인.
 
@@ -644,13 +672,16 @@ def design_advisor_node(state: GraphState) -> dict:
     _write_progress(f"조회 완료: year={current_year}, skill={skill_rnd}, vehicles={len(rows)}")
 
     # ── Step 1.5: 서브컴포넌트 속성 (NEW) ──
-    sub_data = _fetch_sub_components(db_path, rows) if rows else {}
+    # 서브컴포넌트는 타겟 차량(rows[0])의 것만 쓰므로 그 한 대만 조회
+    sub_data = _fetch_sub_components(db_path, rows[:1]) if rows else {}
 
     # ── Stage 0: 목표 추출 (1 LLM call) ──
     _write_progress("Stage 0: 설계 목표 추출 중...")
-    vehicle_summary = _format_slider_context(rows) if rows else "(신규 설계 — 활성 차량 없음)"
-    if len(vehicle_summary) > 6000:
-        vehicle_summary = vehicle_summary[:6000] + "\n...(truncated)"
+    vehicle_summary = (
+        _format_slider_context(rows, max_chars=_VEHICLE_SUMMARY_MAX) if rows else "(신규 설계 — 활성 차량 없음)"
+    )
+    if len(vehicle_summary) > _VEHICLE_SUMMARY_MAX:
+        vehicle_summary = vehicle_summary[:_VEHICLE_SUMMARY_MAX] + "\n...(truncated)"
     goal = _extract_design_goal(llm, question, vehicle_summary)
     _write_progress(f"목표: mode={goal.get('mode')}, scope={goal.get('specific_component')}, type={goal.get('car_type')}")
 
@@ -997,34 +1028,16 @@ def forecast_advisor_node(state: GraphState) -> dict:
     analyst_summary = state.get("analyst_summary", "")
 
     # ── Step 1: 현재 연도 + 플레이어 자산 도시 목록 조회 ──
-    current_year = 1900
-    current_month = 1
+    # 연도는 세이브 mtime 기준 턴 캐시에서 (pre_router가 이미 읽어 둠)
+    current_year = get_current_turn(db_path)[0] or 1900
     player_city_ids = []
 
     try:
-        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
-
-        # 현재 연도/월
-        cursor = conn.execute(CURRENT_YEAR_SQL)
-        row = cursor.fetchone()
-        if row:
-            try:
-                current_year = int(row[0])
-            except (ValueError, TypeError):
-                pass
-
-        cursor = conn.execute(CURRENT_TURN_SQL)
-        row = cursor.fetchone()
-        if row:
-            try:
-                current_month = int(row[0])
-            except (ValueError, TypeError):
-                pass
-
-        # 플레이어 공장/지점 도시 목록
-        cursor = conn.execute(PLAYER_CITY_IDS_SQL)
+        conn = get_ro_conn(db_path)
+        # 회사 ID는 한 번만 읽어 바인딩 (UNION 양쪽에서 PlayerInfo 서브쿼리를 반복하지 않음)
+        company_id = int(load_player_state(conn)["Company_ID"])
+        cursor = conn.execute(PLAYER_CITY_IDS_SQL, {"cid": company_id})
         player_city_ids = [r[0] for r in cursor.fetchall()]
-        conn.close()
 
     except Exception:
         pass  # 조회 실패 시 빈 목록으로 진행
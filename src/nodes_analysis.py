@@ -5,21 +5,28 @@ analyst, classifier, strategist, aggregator
 """
 
 import re
-import sqlite3
 
+from langgraph.config import get_stream_writer
 from langgraph.graph import END
 
 from src.graph_state import GraphState, StrategyCandidate, CORE_TABLES
 from src.prompts import ANALYST_PROMPT, CLASSIFIER_PROMPT, STRATEGIST_PROMPT, AGGREGATOR_PROMPT
-from src.queries import CURRENT_YEAR_SQL
 from src.graph_utils import (
-    create_llm, build_table_catalog, strip_think_tags,
+    create_llm, embed_text, get_current_turn, build_table_catalog, strip_think_tags,
     LLM_MAX_TOKENS_CLASSIFY,
 )
 from src.session_memory import get_memory, DOMAIN_CONFIG
 from src.event_timeline import get_timeline
 
 
+# Strategist 출력 파싱: STRATEGY{1~4}_{NAME|DESC|QUERIES|TABLES}: 값 — 한 패턴으로 전부 찾는다.
+# 전방탐색(폭 0 매치)이라 빈 값 뒤 다음 줄을 값으로 잡아도 그 줄의 필드가 누락되지 않는다.
+_RE_STRATEGY_FIELD = re.compile(r"(?=STRATEGY([1-4])_(NAME|DESC|QUERIES|TABLES):\s*(.+))")
+
+# 파싱 실패 시 strategist가 넣는 단일 일반 전략 (aggregator가 알아보고 건너뜀)
+_FALLBACK_STRATEGY_NAME = "General Improvement"
+
+
 def analyst_node(state: GraphState) -> dict:
     """수집된 모든 결과를 종합 분석, 최종 답변 생성."""
     llm = create_llm(temperature=0.3)
@@ -48,21 +55,21 @@ def analyst_node(state: GraphState) -> dict:
         errors_section=errors_section,
         memory_context=mem_ctx if mem_ctx else "(No cached data)",
     )
-    response = llm.invoke(prompt)
-    answer = strip_think_tags(response.content)
+    # stream으로 받아야 run_query(on_token=...)가 토큰 단위로 사용자에게 중계할 수 있다
+    answer = strip_think_tags("".join(chunk.content for chunk in llm.stream(prompt)))
 
     # 서브쿼리에서 사용된 테이블 수집 → 도메인별로 분류하여 캐시 저장
-    all_tables: set[str] = set()
-    for sq in state["sub_queries"]:
-        all_tables.update(sq.get("relevant_tables", []))
+    # 서브쿼리별 테이블 집합은 한 번만 만든다 (결과 없는 서브쿼리는 캐시 대상 아님)
+    sq_tables = [(sq, frozenset(sq.get("relevant_tables", []))) for sq in state["sub_queries"]]
+    all_tables: set[str] = set().union(*(ts for _, ts in sq_tables))
+    answered = [(sq, ts) for sq, ts in sq_tables if sq["result"]]
 
     domains = memory.classify_tables(list(all_tables))
     for domain in domains:
         domain_tables = DOMAIN_CONFIG[domain]["tables"] & all_tables
-        domain_results = []
-        for sq in state["sub_queries"]:
-            if set(sq.get("relevant_tables", [])) & domain_tables and sq["result"]:
-                domain_results.append(f"Q: {sq['question']}\n{sq['result']}")
+        domain_results = [
+            f"Q: {sq['question']}\n{sq['result']}" for sq, ts in answered if ts & domain_tables
+        ]
         if domain_results:
             memory.put(domain, "\n\n".join(domain_results), domain_tables)
 
@@ -73,10 +80,24 @@ def analyst_node(state: GraphState) -> dict:
 
 
 def classifier_node(state: GraphState) -> dict:
-    """질문 유형 분류: factual / analytical / strategic / design / forecast."""
+    """질문 유형 분류: factual / analytical / strategic / design / forecast.
+
+    세션에서 같거나 비슷한 질문(임베딩 KNN)을 이미 분류했으면 LLM 호출 없이 재사용한다.
+    """
+    memory = get_memory()
+    question = state["user_question"]
+    qtype = memory.question_type(question)
+    if qtype is not None:
+        return {"question_type": qtype}
+    vec = embed_text(question)
+    qtype = memory.question_type(question, vec)
+    if qtype is not None:
+        memory.remember_question_type(question, qtype)
+        return {"question_type": qtype}
+
     llm = create_llm(temperature=0, max_tokens=LLM_MAX_TOKENS_CLASSIFY)
     prompt = CLASSIFIER_PROMPT.format(
-        question=state["user_question"],
+        question=question,
         analyst_summary=state.get("analyst_summary", ""),
     )
     response = llm.invoke(prompt)
@@ -94,6 +115,7 @@ def classifier_node(state: GraphState) -> dict:
     else:
         qtype = "factual"
 
+    memory.remember_question_type(question, qtype, vec)
     return {"question_type": qtype}
 
 
@@ -118,11 +140,7 @@ def strategist_node(state: GraphState) -> dict:
     try:
         tl = get_timeline()
         # DB에서 현재 연도 조회
-        conn = sqlite3.connect(f"file:{state['db_path']}?mode=ro", uri=True)
-        cursor = conn.execute(CURRENT_YEAR_SQL)
-        row = cursor.fetchone()
-        conn.close()
-        current_year = int(row[0]) if row else 1900
+        current_year = get_current_turn(state["db_path"])[0] or 1900
         event_forecast = tl.format_forecast_summary(current_year, lookahead=15)
     except Exception:
         pass
@@ -136,21 +154,23 @@ def strategist_node(state: GraphState) -> dict:
     response = llm.invoke(prompt)
     raw = strip_think_tags(response.content)
 
-    # 파싱: STRATEGY1_NAME/DESC/QUERIES/TABLES 패턴
+    # 파싱: STRATEGY1_NAME/DESC/QUERIES/TABLES 패턴 — 한 번의 스캔으로 (번호, 필드) → 값
+    fields: dict[tuple[int, str], str] = {}
+    for m in _RE_STRATEGY_FIELD.finditer(raw):
+        fields.setdefault((int(m.group(1)), m.group(2)), m.group(3))
+
     candidates: list[StrategyCandidate] = []
     for i in range(1, 5):
-        name_m = re.search(rf"STRATEGY{i}_NAME:\s*(.+)", raw)
-        desc_m = re.search(rf"STRATEGY{i}_DESC:\s*(.+)", raw)
-        queries_m = re.search(rf"STRATEGY{i}_QUERIES:\s*(.+)", raw)
-        tables_m = re.search(rf"STRATEGY{i}_TABLES:\s*(.+)", raw)
-
-        if name_m and desc_m:
-            queries = [q.strip() for q in (queries_m.group(1) if queries_m else "").split(",") if q.strip()]
-            tables = [t.strip() for t in (tables_m.group(1) if tables_m else "").split(",") if t.strip()]
+        name = fields.get((i, "NAME"))
+        desc = fields.get((i, "DESC"))
+
+        if name and desc:
+            queries = [q.strip() for q in fields.get((i, "QUERIES"), "").split(",") if q.strip()]
+            tables = [t.strip() for t in fields.get((i, "TABLES"), "").split(",") if t.strip()]
             candidates.append(StrategyCandidate(
                 id=i,
-                name=name_m.group(1).strip(),
-                description=desc_m.group(1).strip(),
+                name=name.strip(),
+                description=desc.strip(),
                 data_queries=queries if queries else [state["user_question"]],
                 relevant_tables=tables if tables else CORE_TABLES[:5],
             ))
@@ -159,7 +179,7 @@ def strategist_node(state: GraphState) -> dict:
     if not candidates:
         candidates.append(StrategyCandidate(
             id=1,
-            name="General Improvement",
+            name=_FALLBACK_STRATEGY_NAME,
             description="Analyze current performance and suggest general improvements.",
             data_queries=[state["user_question"]],
             relevant_tables=CORE_TABLES,
@@ -169,7 +189,7 @@ def strategist_node(state: GraphState) -> dict:
 
 
 def aggregator_node(state: GraphState) -> dict:
-    """전략 후보를 analyst_summary 데이터로 직접 비교 → 최종 추천. (LLM 1회)
+    """전략 후보를 analyst_summary 데이터로 직접 비교 → 최종 추천. (LLM 1회, 후보가 1개면 0회)
 
     기존 evaluator 단계(전략별 SQL+LLM 평가)를 제거하고,
     이미 수집된 analyst_summary만으로 전략을 비교/추천한다.
@@ -181,6 +201,16 @@ def aggregator_node(state: GraphState) -> dict:
     if not candidates:
         return {"final_answer": analyst_summary}
 
+    # 전략이 하나뿐이면 비교/순위를 매길 대상이 없다 — LLM 없이 분석 요약 + 그 전략으로 답변.
+    # (analyst 답변은 이미 스트리밍됐으므로 덧붙이는 부분만 custom 스트림으로 내보낸다)
+    if len(candidates) == 1:
+        c = candidates[0]
+        if c["name"] == _FALLBACK_STRATEGY_NAME:
+            return {"final_answer": analyst_summary}
+        section = f"### Strategy {c['id']}: {c['name']}\n{c['description']}"
+        get_stream_writer()(section)
+        return {"final_answer": f"{analyst_summary}\n\n{section}"}
+
     # 전략 후보 섹션 구성
     strategy_sections = []
     for c in candidates:
@@ -193,6 +223,5 @@ def aggregator_node(state: GraphState) -> dict:
         analyst_summary=analyst_summary,
         evaluations_section=strategies_text,
     )
-    response = llm.invoke(prompt)
-    answer = strip_think_tags(response.content)
+    answer = strip_think_tags("".join(chunk.content for chunk in llm.stream(prompt)))
     return {"final_answer": answer}
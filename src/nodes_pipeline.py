@@ -1,19 +1,20 @@
 """
 GearCity Pipeline Nodes — SQL 파이프라인 핵심 노드
 ===================================================
-pre_router, planner, load_schema, sql_generator, executor, router, retry, advance
+pre_router, planner, sub_query (서브쿼리별 병렬 SQL 생성/실행/재시도)
 """
 
+import os
 import re
-import sqlite3
+import threading
+from collections import OrderedDict
 
-import pandas as pd
+from langgraph.types import Send
 
-from src.graph_state import GraphState, SubQuery, CORE_TABLES, MAX_SUB_QUERIES, MAX_RETRIES
+from src.graph_state import GraphState, SubQuery, SubQueryTask, CORE_TABLES, MAX_SUB_QUERIES, MAX_RETRIES
 from src.prompts import PLANNER_PROMPT, SQL_GENERATOR_PROMPT
-from src.queries import CURRENT_YEAR_SQL, CURRENT_TURN_SQL
 from src.graph_utils import (
-    create_llm, build_table_catalog, extract_table_schemas,
+    create_llm, get_ro_conn, get_current_turn, cursor_to_csv, build_table_catalog, extract_table_schemas,
     clean_sql, strip_think_tags,
     LLM_MAX_TOKENS_PLAN, LLM_MAX_TOKENS_SQL,
 )
@@ -62,38 +63,71 @@ _DESIGN_KW_WEAK = [
 ]
 
 
-def _get_current_turn(db_path: str) -> tuple[int, int]:
-    """GameInfo에서 현재 연도/월 조회. 실패 시 (0, 0)."""
-    try:
-        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
-        cur = conn.cursor()
-        cur.execute(CURRENT_YEAR_SQL)
-        year = int(cur.fetchone()[0])
-        cur.execute(CURRENT_TURN_SQL)
-        month = int(cur.fetchone()[0])
-        conn.close()
-        return (year, month)
-    except Exception:
-        return (0, 0)
+def _kw_regex(keywords: list[str]) -> re.Pattern:
+    """키워드 목록 → 한 번에 스캔하는 alternation 정규식. (긴 키워드 우선: wwii가 wwi보다 먼저)"""
+    return re.compile("|".join(map(re.escape, sorted(set(keywords), key=len, reverse=True))))
+
+
+_RE_FORECAST_STRONG = _kw_regex(_FORECAST_KW_STRONG)
+_RE_FORECAST_WEAK = _kw_regex(_FORECAST_KW_WEAK)
+_RE_DESIGN_STRONG = _kw_regex(_DESIGN_KW_STRONG)
+_RE_DESIGN_WEAK = _kw_regex(_DESIGN_KW_WEAK)
+
+
+def _kw_hits(pattern: re.Pattern, q: str) -> int:
+    """질문에 등장한 서로 다른 키워드 수. (같은 키워드 반복은 1회로)"""
+    return len(set(pattern.findall(q)))
+
+
+# Planner 출력 파싱: SUB1: ... / TABLES1: ...
+_RE_SUB = re.compile(r"SUB(\d+):\s*(.+)")
+_RE_TABLES = re.compile(r"TABLES(\d+):\s*(.+)")
+# SQLn: ... 은 여러 줄일 수 있으므로 다음 SUB/TABLES/SQL 필드 또는 끝까지
+_RE_SQL = re.compile(
+    r"^SQL(\d+):\s*(.+?)(?=^(?:SUB|TABLES|SQL)\d+:|\Z)", re.DOTALL | re.MULTILINE
+)
+
+
+# 실행 결과 LRU: (세이브 경로, mtime_ns, SQL) → CSV 결과
+# 세이브는 게임이 다시 쓰기 전까지 읽기 전용이므로 mtime이 같으면 같은 SQL의 결과도 같다.
+_SQL_CACHE: OrderedDict[tuple[str, int, str], str] = OrderedDict()
+_SQL_CACHE_MAX = 256
+# 병렬 sub_query 브랜치가 캐시와 공유 read-only 연결을 함께 쓰므로 실행은 한 번에 하나씩
+# (SQL 실행은 ms 단위라 직렬화해도 LLM 호출의 병렬성에는 영향이 없다)
+_SQL_LOCK = threading.Lock()
+
+
+def _run_sql_cached(db_path: str, sql: str) -> str:
+    """SQL을 실행해 최대 30행의 CSV 결과를 반환. 같은 세이브 버전에서 반복된 SQL은 캐시에서."""
+    # 끝의 세미콜론 유무만 다른 같은 쿼리도 한 항목으로 (clean_sql은 ';'를 붙이기도, 안 붙이기도 한다)
+    key = (db_path, os.stat(db_path).st_mtime_ns, sql.strip().rstrip(";").rstrip())
+    with _SQL_LOCK:
+        hit = _SQL_CACHE.get(key)
+        if hit is not None:
+            _SQL_CACHE.move_to_end(key)
+            return hit
+
+        # 최대 30행으로 제한
+        cur = get_ro_conn(db_path).execute(sql)
+        result_str = cursor_to_csv(cur, limit=30) or "(No results)"
+
+        _SQL_CACHE[key] = result_str
+        if len(_SQL_CACHE) > _SQL_CACHE_MAX:
+            _SQL_CACHE.popitem(last=False)
+    return result_str
 
 
 def pre_router_node(state: GraphState) -> dict:
     """키워드 기반 사전 분류. forecast/design이면 SQL 파이프라인 우회."""
     # 세션 메모리: 현재 게임 턴 업데이트
-    year, month = _get_current_turn(state["db_path"])
+    year, month = get_current_turn(state["db_path"])
     get_memory().update_turn(year, month)
 
     q = state["user_question"].lower()
 
     # 강한 키워드 1개 = 2점, 약한 키워드 1개 = 1점
-    forecast_score = (
-        sum(2 for kw in _FORECAST_KW_STRONG if kw in q)
-        + sum(1 for kw in _FORECAST_KW_WEAK if kw in q)
-    )
-    design_score = (
-        sum(2 for kw in _DESIGN_KW_STRONG if kw in q)
-        + sum(1 for kw in _DESIGN_KW_WEAK if kw in q)
-    )
+    forecast_score = 2 * _kw_hits(_RE_FORECAST_STRONG, q) + _kw_hits(_RE_FORECAST_WEAK, q)
+    design_score = 2 * _kw_hits(_RE_DESIGN_STRONG, q) + _kw_hits(_RE_DESIGN_WEAK, q)
 
     # 2점 이상이면 분류 확정
     if forecast_score >= 2 and forecast_score >= design_score:
@@ -133,22 +167,25 @@ def planner_node(state: GraphState) -> dict:
     response = llm.invoke(prompt)
     raw = strip_think_tags(response.content)
 
-    # 파싱: SUB1: ... / TABLES1: ... 패턴
+    # 파싱: SUB1: ... / TABLES1: ... / SQL1: ... 패턴
     sub_queries: list[SubQuery] = []
-    sub_matches = re.findall(r"SUB(\d+):\s*(.+)", raw)
-    table_matches = re.findall(r"TABLES(\d+):\s*(.+)", raw)
+    sub_matches = _RE_SUB.findall(raw)
+    table_matches = _RE_TABLES.findall(raw)
 
     table_map = {}
     for idx_str, tables_str in table_matches:
         table_map[idx_str] = [t.strip() for t in tables_str.split(",") if t.strip()]
 
+    # Planner가 함께 쓴 SQL — 있으면 sub_query에서 스키마 로드/SQL 생성을 건너뛴다
+    sql_map = {idx_str: clean_sql(sql) for idx_str, sql in _RE_SQL.findall(raw)}
+
     for idx_str, question in sub_matches:
         tables = table_map.get(idx_str, CORE_TABLES[:5])
         sub_queries.append(SubQuery(
             id=int(idx_str),
             question=question.strip(),
             relevant_tables=tables,
-            sql="",
+            sql=sql_map.get(idx_str, ""),
             result="",
             error="",
             retry_count=0,
@@ -169,105 +206,74 @@ def planner_node(state: GraphState) -> dict:
     # 최대 5개로 제한
     sub_queries = sub_queries[:MAX_SUB_QUERIES]
 
-    return {"sub_queries": sub_queries, "current_index": 0, "memory_context": mem_ctx}
+    return {"sub_queries": sub_queries, "memory_context": mem_ctx}
 
 
-def load_schema_node(state: GraphState) -> dict:
-    """현재 서브쿼리에 필요한 테이블 스키마를 추출."""
-    idx = state["current_index"]
-    sq = state["sub_queries"][idx]
-    schema_text = extract_table_schemas(sq["relevant_tables"])
-    if not schema_text:
-        # 테이블을 찾지 못하면 코어 테이블로 폴백
-        schema_text = extract_table_schemas(CORE_TABLES)
-    return {"schema_context": schema_text}
+def fan_out_sub_queries(state: GraphState) -> list[Send]:
+    """서브쿼리마다 sub_query 노드를 하나씩 띄운다. (서로 독립이라 SQL 생성 LLM 호출/실행이 겹쳐 진행)"""
+    max_retries = state.get("max_retries", MAX_RETRIES)
+    return [
+        Send("sub_query", SubQueryTask(
+            db_path=state["db_path"], index=i, sub_query=sq, max_retries=max_retries,
+        ))
+        for i, sq in enumerate(state["sub_queries"])
+    ]
+
 
+def _load_schema(tables: list[str], question: str) -> str:
+    """서브쿼리에 필요한 테이블 스키마를 추출. 찾지 못하면 코어 테이블로 폴백.
 
-def sql_generator_node(state: GraphState) -> dict:
-    """서브쿼리 하나에 대해 SQL 생성."""
+    샘플 데이터 표는 서브쿼리 질문에 이름이 나온 테이블만 넣는다. (나머지는 컬럼 목록만 — 프롬프트 토큰 절감)
+    """
+    q = question.lower()
+    named = {t for t in (*tables, *CORE_TABLES) if t.lower() in q}
+    return (
+        extract_table_schemas(tables, sample_tables=named)
+        or extract_table_schemas(CORE_TABLES, sample_tables=named)
+    )
+
+
+def _generate_sql(sq: SubQuery) -> str:
+    """서브쿼리 하나에 대해 SQL 생성. 이전 실행 에러가 있으면 프롬프트에 넣어 고치게 한다."""
     llm = create_llm(temperature=0, max_tokens=LLM_MAX_TOKENS_SQL)
-    idx = state["current_index"]
-    sq = state["sub_queries"][idx]
 
     error_context = ""
     if sq["error"]:
         error_context = f"\n## Previous Error (fix this)\n{sq['error']}\n"
 
     prompt = SQL_GENERATOR_PROMPT.format(
-        schema=state["schema_context"],
+        schema=_load_schema(sq["relevant_tables"], sq["question"]),
         question=sq["question"],
         error_context=error_context,
     )
     response = llm.invoke(prompt)
-    raw = strip_think_tags(response.content)
-    sql = clean_sql(raw)
-
-    # sub_queries 업데이트 (불변 리스트이므로 새로 생성)
-    updated = list(state["sub_queries"])
-    updated[idx] = {**updated[idx], "sql": sql}
-    return {"sub_queries": updated}
+    return clean_sql(strip_think_tags(response.content))
 
 
-def executor_node(state: GraphState) -> dict:
-    """SQLite에서 SQL 실행 (read-only), 결과 or 에러 수집."""
-    idx = state["current_index"]
-    sq = state["sub_queries"][idx]
-    sql = sq["sql"]
+def sub_query_node(task: SubQueryTask) -> dict:
+    """서브쿼리 하나를 끝까지 처리: (Planner SQL이 없으면) SQL 생성 → 실행 → 에러 시 재생성 후 재시도."""
+    sq = dict(task["sub_query"])
+    errors: list[str] = []
 
-    updated = list(state["sub_queries"])
-    error_log = list(state.get("error_log", []))
+    # Planner가 쓴 SQL이 있으면 스키마 로드/SQL 생성 없이 바로 실행
+    if not sq["sql"].strip():
+        sq["sql"] = _generate_sql(sq)
 
-    if not sql or not sql.strip():
-        updated[idx] = {**updated[idx], "error": "Empty SQL generated", "result": ""}
-        error_log.append(f"Sub{sq['id']}: Empty SQL")
-        return {"sub_queries": updated, "error_log": error_log}
-
-    try:
-        conn = sqlite3.connect(f"file:{state['db_path']}?mode=ro", uri=True)
-        df = pd.read_sql_query(sql, conn)
-        conn.close()
-
-        if df.empty:
-            result_str = "(No results)"
+    while True:
+        if not sq["sql"].strip():
+            sq["result"], sq["error"] = "", "Empty SQL generated"
+            errors.append(f"Sub{sq['id']}: Empty SQL")
         else:
-            # 최대 30행으로 제한
-            result_str = df.head(30).to_markdown(index=False)
-
-        updated[idx] = {**updated[idx], "result": result_str, "error": ""}
-        return {"sub_queries": updated, "error_log": error_log}
-
-    except Exception as e:
-        err_msg = str(e)
-        updated[idx] = {**updated[idx], "error": err_msg, "result": ""}
-        error_log.append(f"Sub{sq['id']} (try {sq['retry_count'] + 1}): {err_msg}")
-        return {"sub_queries": updated, "error_log": error_log}
-
-
-def router_node(state: GraphState) -> str:
-    """에러 → retry / 다음 서브쿼리 → advance / 전부 완료 → analyst."""
-    idx = state["current_index"]
-    sq = state["sub_queries"][idx]
-
-    # 에러가 있고 재시도 여유가 있으면 retry
-    if sq["error"] and sq["retry_count"] < state.get("max_retries", MAX_RETRIES):
-        return "retry"
-
-    # 다음 서브쿼리가 있으면 advance
-    if idx + 1 < len(state["sub_queries"]):
-        return "advance"
-
-    # 모두 완료
-    return "analyst"
-
-
-def retry_node(state: GraphState) -> dict:
-    """재시도: retry_count 증가 후 다시 SQL Generator로."""
-    idx = state["current_index"]
-    updated = list(state["sub_queries"])
-    updated[idx] = {**updated[idx], "retry_count": updated[idx]["retry_count"] + 1}
-    return {"sub_queries": updated}
-
-
-def advance_node(state: GraphState) -> dict:
-    """다음 서브쿼리로 이동."""
-    return {"current_index": state["current_index"] + 1}
+            try:
+                sq["result"], sq["error"] = _run_sql_cached(task["db_path"], sq["sql"]), ""
+            except Exception as e:
+                sq["result"], sq["error"] = "", str(e)
+                errors.append(f"Sub{sq['id']} (try {sq['retry_count'] + 1}): {sq['error']}")
+
+        if not sq["error"] or sq["retry_count"] >= task["max_retries"]:
+            break
+        sq["retry_count"] += 1
+        sq["sql"] = _generate_sql(sq)
+
+    # 이 서브쿼리만 갱신 (merge_sub_queries reducer) — 병렬 브랜치끼리 서로 덮어쓰지 않는다
+    return {"sub_queries": {task["index"]: sq}, "error_log": errors}
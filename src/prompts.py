@@ -43,24 +43,26 @@ a sub-question, you can skip that sub-query or reduce the number of sub-queries
 ## User Question
 {question}
 
-## Output Format (STRICTLY follow this format, one sub-query per line)
+## Output Format (STRICTLY follow this format, one field per line)
 SUB1: <sub-question in English>
 TABLES1: <comma-separated table names>
+SQL1: <single-line SQLite SELECT answering SUB1>
 SUB2: <sub-question in English>
 TABLES2: <comma-separated table names>
+SQL2: <single-line SQLite SELECT answering SUB2>
 ...
 
 Output ONLY the sub-queries. No explanations, no markdown, no extra text.
-If the question is simple enough for one query, output just SUB1/TABLES1."""
+If the question is simple enough for one query, output just SUB1/TABLES1/SQL1.
+Write SQLn only when the catalog columns above are enough to be sure of the query (use LIMIT 20 unless all rows are needed);
+otherwise omit that SQLn line and it will be written later with the full schema."""
 
 
+# 고정 규칙을 앞에, 서브쿼리마다 바뀌는 스키마/질문을 뒤에 — Ollama가 공통 prefix의 KV 캐시를 재사용한다
 SQL_GENERATOR_PROMPT = """\
 You are a SQLite SQL expert for the game GearCity.
 Write a single SELECT query to answer the question below.
 
-## Database Schema
-{schema}
-
 ## KEY RULES
 - Output ONLY the raw SQL. No markdown fences, no explanation, no comments.
 - Use LIMIT 20 unless the question needs all rows.
@@ -73,6 +75,9 @@ Write a single SELECT query to answer the question below.
 - License/rebadge in CarInfo: RoyalityComp != -1 means licensed, RebadgeBuyFromCompID != -1 means rebadged.
 - Component availability: *Components tables have SkillReq (design skill needed) and Year (unlock year). Filter: SkillReq <= player's SKILL_RND from CompanyList, Year <= current year, AND (Death IS NULL OR Death > current year).
 
+## Database Schema
+{schema}
+
 ## Question
 {question}
 {error_context}
@@ -87,6 +92,7 @@ The user asked: "{question}"
 {memory_context}
 
 Below are the results from database queries. Analyze them and provide a clear, comprehensive answer.
+Each result is CSV (first line = column names, at most 30 rows).
 
 {results_section}
 
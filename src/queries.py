@@ -19,6 +19,16 @@ CURRENT_TURN_SQL = (
     "SELECT GameInfo_Data FROM GameInfo WHERE GameInfo_Varible = 'Current_Turn'"
 )
 
+# 현재 연도/월을 한 번에: [(Varible, Data), ...]
+CURRENT_DATE_SQL = (
+    "SELECT GameInfo_Varible, GameInfo_Data FROM GameInfo "
+    "WHERE GameInfo_Varible IN ('Current_Year', 'Current_Turn')"
+)
+
+# 키-값 테이블 전체 (행 수가 몇 개뿐이라 한 번에 읽어 dict로 쓴다)
+PLAYER_STATE_SQL = "SELECT Player_Varible, Player_Data FROM PlayerInfo"
+GAME_STATE_SQL = "SELECT GameInfo_Varible, GameInfo_Data FROM GameInfo"
+
 # ── design_advisor: 플레이어 차량+엔진+샤시+기어박스 JOIN ────────
 
 DESIGN_VEHICLE_SQL = """\
@@ -217,11 +227,9 @@ LEFT JOIN SuspensionComponents fs ON ch.Fr_Suspension = fs.Name
 LEFT JOIN SuspensionComponents rs ON ch.Rr_Suspension = rs.Name
 WHERE ch.Chassis_ID = ?"""
 
-# ── forecast_advisor: 플레이어 자산 도시 조회 ────────────────────
+# ── forecast_advisor: 플레이어 자산 도시 조회 (:cid = 플레이어 회사 ID) ──
 
 PLAYER_CITY_IDS_SQL = """\
-SELECT DISTINCT City_ID FROM FactoryInfo
-WHERE Company_ID = (""" + PLAYER_COMPANY_ID_SUBQUERY + """)
+SELECT City_ID FROM FactoryInfo WHERE Company_ID = :cid
 UNION
-SELECT DISTINCT City_ID FROM CarDistro
-WHERE Company_ID = (""" + PLAYER_COMPANY_ID_SUBQUERY + """) AND Sold_This_Month > 0"""
+SELECT City_ID FROM CarDistro WHERE Company_ID = :cid AND Sold_This_Month > 0"""
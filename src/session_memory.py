@@ -15,6 +15,8 @@ GearCity Session Memory — 도메인 기반 세션 캐시
 
 from dataclasses import dataclass, field
 
+import numpy as np
+
 # ── 도메인 설정 ─────────────────────────────────────────────────
 
 DOMAIN_CONFIG: dict[str, dict] = {
@@ -44,6 +46,9 @@ DOMAIN_CONFIG: dict[str, dict] = {
     },
 }
 
+# 질문 유형 캐시: 이전 질문과 임베딩 코사인 유사도가 이 이상이면 같은 유형으로 본다
+QTYPE_SIMILARITY = 0.92
+
 # 역매핑: 테이블명 → 도메인
 TABLE_TO_DOMAIN: dict[str, str] = {}
 for _domain, _cfg in DOMAIN_CONFIG.items():
@@ -78,6 +83,10 @@ class SessionMemory:
     def __init__(self):
         self._cache: dict[str, DomainCache] = {}
         self._current_turn: int = 0  # year*12 + month
+        # Classifier 결과 캐시: 정규화된 질문 → 유형, (정규화 임베딩, 유형) 목록
+        self._qtype_exact: dict[str, str] = {}
+        self._qtype_vecs: list[np.ndarray] = []
+        self._qtype_labels: list[str] = []
 
     def update_turn(self, year: int, month: int):
         """현재 게임 턴 업데이트. 만료된 캐시 정리."""
@@ -128,6 +137,22 @@ class SessionMemory:
             parts.append(f"[Cached: {domain} ({age}턴 전)]\n{data_preview}")
         return "\n\n".join(parts)
 
+    def question_type(self, question: str, vec: np.ndarray | None = None) -> str | None:
+        """이전에 분류한 질문과 같거나(정확 일치) 충분히 비슷하면(vec 코사인) 그 유형. 없으면 None."""
+        label = self._qtype_exact.get(_normalize_question(question))
+        if label is not None or vec is None or not self._qtype_labels:
+            return label
+        sims = np.vstack(self._qtype_vecs) @ vec
+        best = int(sims.argmax())
+        return self._qtype_labels[best] if sims[best] >= QTYPE_SIMILARITY else None
+
+    def remember_question_type(self, question: str, qtype: str, vec: np.ndarray | None = None):
+        """Classifier 결과 저장. 게임 턴과 무관하므로 TTL 없이 세션 동안 유지."""
+        self._qtype_exact[_normalize_question(question)] = qtype
+        if vec is not None:
+            self._qtype_vecs.append(vec)
+            self._qtype_labels.append(qtype)
+
     def classify_tables(self, tables: list[str]) -> set[str]:
         """테이블 목록 → 관련 도메인 집합. (public API)"""
         return self._classify_tables(tables)
@@ -159,6 +184,10 @@ class SessionMemory:
         return domains
 
 
+def _normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
 # ── 모듈 수준 싱글톤 ────────────────────────────────────────────
 
 _memory_instance: SessionMemory | None = None
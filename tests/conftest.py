@@ -0,0 +1,18 @@
+"""오프라인 테스트 공통 설정 — Ollama/실제 세이브 없이 src 모듈을 import할 수 있게 한다."""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# src.db_query_graph 등은 import 시점에 GEARCITY_DB_PATH를 요구한다
+if not os.getenv("GEARCITY_DB_PATH"):
+    _db = Path(tempfile.mkdtemp(prefix="gearcity-test-")) / "save.db"
+    sqlite3.connect(_db).close()
+    os.environ["GEARCITY_DB_PATH"] = str(_db)
+# 테스트 중 LLM 워밍업 스레드를 띄우지 않는다
+os.environ.setdefault("GEARCITY_WARMUP", "0")
@@ -0,0 +1,50 @@
+"""crawler HTML 파싱 백엔드(selectolax / bs4) 동등성 테스트."""
+
+import pytest
+
+import crawler
+
+pytest.importorskip("selectolax")
+
+URL = "https://wiki.gearcity.info/doku.php?id=gamemanual:howto_vehiclepricing"
+
+# #dokuwiki__content가 있는 일반 페이지
+PAGE_WITH_MAIN = """
+<html><body><div class="dokuwiki">
+  <div id="dokuwiki__header"><h1>GearCity Wiki</h1></div>
+  <div id="dokuwiki__content">
+    <div class="toc"><h3>Table of Contents</h3></div>
+    <h1>Vehicle Pricing</h1>
+    <p>Set the price <a href="/doku.php?id=gamemanual:sales#top">after</a> testing.<br>Then wait.</p>
+    <ul><li>Cost</li><li>Margin</li></ul>
+    <table><tr><th>Year</th><th>Price</th></tr><tr><td>1900</td><td>500</td></tr></table>
+  </div>
+  <div id="dokuwiki__footer">gamemanual:howto_vehiclepricing.txt · Last modified: 2020</div>
+</div></body></html>
+"""
+
+# #dokuwiki__content 없이 div.dokuwiki만 있는 페이지 — 제목은 URL에서
+PAGE_WITHOUT_MAIN = """
+<html><body><div class="dokuwiki">
+  <div id="dokuwiki__header"><h1>GearCity Wiki</h1></div>
+  <h2>Pricing Notes</h2>
+  <p>See <a href="/doku.php?id=gamemanual:sales">sales</a>.</p>
+</div></body></html>
+"""
+
+# 본문 노드가 전혀 없는 페이지
+PAGE_WITHOUT_CONTENT = "<html><body><p>Redirecting...</p></body></html>"
+
+
+@pytest.mark.parametrize(
+    "html",
+    [PAGE_WITH_MAIN, PAGE_WITHOUT_MAIN, PAGE_WITHOUT_CONTENT],
+    ids=["main", "no-main", "no-content"],
+)
+def test_backends_agree(html):
+    assert crawler._parse_page_lexbor(html, URL, True) == crawler._parse_page_bs4(html, URL, True)
+
+
+def test_title_ignores_site_header_without_main():
+    title, _, _ = crawler._parse_page_lexbor(PAGE_WITHOUT_MAIN, URL, False)
+    assert title == "Howto Vehiclepricing"
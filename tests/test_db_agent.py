@@ -0,0 +1,80 @@
+"""CachedAgent 의미 캐시 테스트 (Ollama 없이 가짜 Agent/LLM/임베딩 사용)."""
+
+import numpy as np
+import pytest
+from langchain_core.messages import AIMessage
+
+from src import db_agent as D
+
+HIGHEST = "Which car model has the highest margin?"
+LOWEST = "Which car model has the lowest margin?"
+
+
+class _DB:
+    def get_usable_table_names(self):
+        return ["CarInfo"]
+
+    def run(self, sql):
+        return "[('Roadster', 0.42)]"
+
+
+class _Agent:
+    def __init__(self):
+        self.questions = []
+
+    def invoke(self, question):
+        self.questions.append(question)
+        return {"output": f"answer to {question}", "intermediate_steps": []}
+
+
+class _LLM:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return AIMessage(content="rerun answer")
+
+
+@pytest.fixture
+def cached(tmp_path):
+    db_path = tmp_path / "save.db"
+    db_path.write_bytes(b"")
+    agent = D.CachedAgent(_Agent(), _DB(), _LLM(), db_path, cache_path=tmp_path / "qa_cache.db")
+    # 임베딩 모델은 최고/최저 질문을 거의 같은 문장으로 본다 (유사도 ~0.99)
+    vectors = {
+        D.normalize_question(HIGHEST): [1.0, 0.0],
+        D.normalize_question(LOWEST): [0.99, 0.14],
+    }
+    agent._embed = lambda text: (lambda v: v / np.linalg.norm(v))(
+        np.asarray(vectors.get(text, [0.0, 1.0]), dtype=np.float32)
+    )
+    yield agent
+    agent._conn.close()
+
+
+def _store_with_sql(agent, question, sql):
+    """Agent가 SQL을 한 번 실행해 답한 것처럼 캐시에 저장한다."""
+    _, key = agent._lookup(question)
+    step = (type("Action", (), {"tool": "sql_db_query", "tool_input": sql})(), "")
+    agent._store(question, key, {"output": f"answer to {question}", "intermediate_steps": [step]})
+
+
+def test_opposite_superlative_falls_through_to_agent(cached):
+    _store_with_sql(cached, HIGHEST, "SELECT name FROM CarInfo ORDER BY margin DESC LIMIT 1")
+
+    response = cached.invoke(LOWEST)
+
+    assert response["output"] == f"answer to {LOWEST}"
+    assert cached.agent.questions == [LOWEST]
+    assert cached.llm.prompts == []
+
+
+def test_exact_question_reruns_sql_after_save_changes(cached):
+    _store_with_sql(cached, HIGHEST, "SELECT name FROM CarInfo ORDER BY margin DESC LIMIT 1")
+    cached._conn.execute("UPDATE qa_cache SET db_mtime = 0")
+
+    response = cached.invoke(f"  {HIGHEST.lower()} ")
+
+    assert response["output"] == "rerun answer"
+    assert cached.agent.questions == []
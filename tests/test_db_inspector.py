@@ -0,0 +1,29 @@
+"""스키마 맵 row count 표기 테스트."""
+
+import io
+import sqlite3
+
+from src import db_inspector as I
+from src.graph_utils import build_table_catalog
+
+
+def test_estimated_row_counts_are_marked_in_catalog(tmp_path):
+    db_path = tmp_path / "save.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE Big (id INTEGER PRIMARY KEY, v TEXT)")
+    conn.execute("CREATE TABLE Small (id INTEGER PRIMARY KEY, v TEXT)")
+    conn.executemany("INSERT INTO Big (v) VALUES (?)", [("x",)] * (I.EXACT_COUNT_BELOW + 10))
+    conn.executemany("INSERT INTO Small (v) VALUES (?)", [("y",)] * 3)
+    # 삭제된 행 때문에 MAX(_rowid_) 추정치가 실제 행 수보다 크다
+    conn.execute("DELETE FROM Big WHERE id <= 5")
+    conn.commit()
+
+    fh = io.StringIO()
+    I.write_schema_doc(db_path, conn.cursor(), conn, fh)
+    conn.close()
+    schema_path = tmp_path / "schema_map.txt"
+    schema_path.write_text(fh.getvalue(), encoding="utf-8")
+
+    catalog = build_table_catalog(schema_path)
+    assert f"- Big (~{I.EXACT_COUNT_BELOW + 10} rows)" in catalog
+    assert "- Small (3 rows)" in catalog
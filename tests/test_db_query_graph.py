@@ -0,0 +1,111 @@
+"""run_query 스트리밍 출력 / 답변 캐시 테스트 (그래프는 가짜 앱으로 대체)."""
+
+import numpy as np
+from langchain_core.messages import AIMessageChunk
+
+from src import db_query_graph as G
+
+ANALYSIS = "현재 연도는 1925년입니다."
+ADVICE = "추천 설계: 엔진 V8, 섀시 경량화."
+
+
+class _FakeApp:
+    """analyst가 토큰을 스트리밍한 뒤 classifier가 설계 자문으로 라우팅하는 실행 흐름."""
+
+    def stream(self, graph_input, config=None, stream_mode=None):
+        yield "messages", (AIMessageChunk(content=ANALYSIS), {"langgraph_node": "analyst"})
+        yield "updates", {"analyst": {"final_answer": ANALYSIS}}
+        yield "values", {**graph_input, "final_answer": ANALYSIS, "analyst_summary": ANALYSIS}
+        yield "updates", {"classifier": {"question_type": "design"}}
+        yield "values", {**graph_input, "final_answer": ANALYSIS, "question_type": "design"}
+        yield "updates", {"design_advisor": {"final_answer": ADVICE}}
+        yield "values", {**graph_input, "final_answer": ADVICE, "question_type": "design"}
+
+
+def _run(monkeypatch, tmp_path, app, question):
+    db = tmp_path / "save.db"
+    db.write_bytes(b"")
+    schema = tmp_path / "schema_map.txt"
+    schema.write_text("", encoding="utf-8")
+    monkeypatch.setattr(G, "SCHEMA_MAP_PATH", schema)
+    monkeypatch.setattr(G, "get_graph", lambda checkpointed=False: app)
+    monkeypatch.setattr(G, "prefetch_schema_map", lambda: None)
+    monkeypatch.setattr(G, "embed_text", lambda text: None)
+    monkeypatch.setattr(G, "_ANSWER_CACHE", type(G._ANSWER_CACHE)())
+
+    printer = G._TokenPrinter(prefix="Agent> ")
+    answer = G.run_query(question, db, on_token=printer)
+    printer.finish(answer)
+    return answer
+
+
+def test_advisor_answer_printed_after_streamed_analysis(monkeypatch, tmp_path, capfd):
+    answer = _run(monkeypatch, tmp_path, _FakeApp(), "1925년에 맞는 차 설계해줘")
+    out = capfd.readouterr().out
+    assert answer == ADVICE
+    assert out.startswith(f"Agent> {ANALYSIS}")
+    assert ADVICE in out
+
+
+def test_streamed_answer_not_printed_twice(monkeypatch, tmp_path, capfd):
+    class AnalystOnly(_FakeApp):
+        def stream(self, graph_input, config=None, stream_mode=None):
+            yield from list(super().stream(graph_input, config, stream_mode))[:3]
+
+    answer = _run(monkeypatch, tmp_path, AnalystOnly(), "현재 연도는?")
+    out = capfd.readouterr().out
+    assert answer == ANALYSIS
+    assert out.count(ANALYSIS) == 1
+
+
+class _EchoApp:
+    """질문을 그대로 답하는 그래프 (invoke 경로)."""
+
+    def __init__(self):
+        self.questions = []
+
+    def invoke(self, graph_input, config=None):
+        self.questions.append(graph_input["user_question"])
+        return {"final_answer": f"answer to {graph_input['user_question']}"}
+
+
+def _near_identical(text):
+    # 임베딩 모델은 "가장 높은"/"가장 낮은" 질문을 거의 같은 문장으로 본다
+    v = np.array([1.0, 0.05 if "낮은" in text else 0.0], dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def _patch_cache(monkeypatch, tmp_path, app):
+    db = tmp_path / "save.db"
+    db.write_bytes(b"")
+    schema = tmp_path / "schema_map.txt"
+    schema.write_text("", encoding="utf-8")
+    monkeypatch.setattr(G, "SCHEMA_MAP_PATH", schema)
+    monkeypatch.setattr(G, "get_graph", lambda checkpointed=False: app)
+    monkeypatch.setattr(G, "prefetch_schema_map", lambda: None)
+    monkeypatch.setattr(G, "embed_text", _near_identical)
+    monkeypatch.setattr(G, "_ANSWER_CACHE", type(G._ANSWER_CACHE)())
+    return db
+
+
+def test_answer_cache_keeps_opposite_superlatives_apart(monkeypatch, tmp_path):
+    app = _EchoApp()
+    db = _patch_cache(monkeypatch, tmp_path, app)
+
+    G.run_query("마진이 가장 높은 모델은?", db)
+    answer = G.run_query("마진이 가장 낮은 모델은?", db)
+
+    assert answer == "answer to 마진이 가장 낮은 모델은?"
+    assert len(app.questions) == 2
+
+
+def test_answer_cache_misses_after_turn_changes(monkeypatch, tmp_path):
+    app = _EchoApp()
+    db = _patch_cache(monkeypatch, tmp_path, app)
+    turns = iter([(1925, 3), (1925, 4)])
+    monkeypatch.setattr(G, "get_current_turn", lambda db_path: next(turns))
+
+    G.run_query("현재 연도는?", db)
+    G.run_query("현재 연도는?", db)
+
+    assert len(app.questions) == 2
@@ -0,0 +1,43 @@
+"""
+크롤러 본문 텍스트 후처리 (공백 정리, 푸터 제거, Markdown 테이블 생성).
+
+DOM과 무관한 순수 문자열 처리만 모아 둔 모듈이라 Cython으로 그대로 컴파일할 수 있다.
+    cythonize -3 -i wiki_text.py
+컴파일된 확장 모듈(wiki_text.*.so / .pyd)이 있으면 import 시 .py보다 먼저 로드되고,
+없으면 이 파일이 그대로 쓰인다.
+"""
+import re
+
+# 페이지마다 쓰는 정규식은 모듈 로드 시 1회 컴파일
+_RE_HSPACE = re.compile(r"[ \t]+")
+# 줄 앞 들여쓰기 (selectolax는 태그 사이 공백 텍스트를 그대로 남겨 bs4 결과와 달라진다)
+_RE_INDENT = re.compile(r"\n[ \t]+")
+_RE_BLANKS = re.compile(r"\n{3,}")
+_RE_FOOTER = re.compile(r"\S+\.txt\s*·\s*Last modified:.*$", re.DOTALL)
+
+
+def clean_text(text: str) -> str:
+    """지저분한 공백 정리: 연속 공백은 하나로, 줄 앞 공백은 제거, 연속 빈 줄은 두 줄까지만 허용."""
+    text = _RE_HSPACE.sub(" ", text)       # 가로 공백 정리
+    text = _RE_INDENT.sub("\n", text)      # 줄 앞 공백 제거
+    text = _RE_BLANKS.sub("\n\n", text)    # 3줄 이상 빈 줄 → 2줄
+    return text.strip()
+
+
+def finalize_text(raw: str) -> str:
+    """본문 원문에서 DokuWiki 푸터 잔여물을 제거하고 공백을 정리한다."""
+    return clean_text(_RE_FOOTER.sub("", raw))
+
+
+def rows_to_markdown(rows: list) -> str:
+    """셀 문자열 행 목록을 Markdown 테이블 문자열로 만든다. (빈 행은 무시, 열 수는 최대 열에 맞춤)"""
+    rows = [r for r in rows if r]
+    if not rows:
+        return ""
+
+    width = max(map(len, rows))
+    lines = [
+        "| " + " | ".join(r + [""] * (width - len(r))) + " |" for r in rows
+    ]
+    lines.insert(1, "| " + " | ".join("---" for _ in range(width)) + " |")
+    return "\n".join(lines)